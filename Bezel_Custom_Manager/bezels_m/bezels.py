@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from systems import get_system_extension, systems
+from systems_index import system_index
 
 
 class Rom:
@@ -39,12 +40,5 @@ class Bezels:
         return roms
 
     def get_available_systems(self, roms_path: str) -> list[str]:
-        all_systems = [system["name"] for system in systems]
-        available_systems = []
-        for system in all_systems:
-            system_path = Path(roms_path) / system
-            if system_path.exists() and any(system_path.iterdir()):
-                available_systems.append(system)
-
-        return available_systems
+        return system_index.get_available_systems(roms_path, [system["name"] for system in systems])
 
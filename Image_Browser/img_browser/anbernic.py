@@ -1,5 +1,5 @@
-import os
-from pathlib import Path
+from storage import storage_state
+from listing import directory_cache
 
 
 class Anbernic:
@@ -31,27 +31,12 @@ class Anbernic:
             self.__current_sd = 1
     
     def get_sd_storage_path(self):
-        if self.__current_sd == 1 or not any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 1 or not storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 1
             return self.get_sd1_storage_path()
         else:
             return self.get_sd2_storage_path()
     
     @staticmethod
-    def get_current_path_files(path):
-        try:
-            entries = os.listdir(path)
-            dirs = []
-            images = []
-            for entry in entries:
-                full_path = os.path.join(path, entry)
-                if os.path.isdir(full_path):
-                    dirs.append(("[+] " + entry, full_path, "dir", entry.lower()))
-                elif entry.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
-                    images.append((entry, full_path, "image", entry.lower()))
-            dirs.sort(key=lambda x: x[3])  # 按原始名称排序
-            images.sort(key=lambda x: x[3])
-            return dirs + images
-        except Exception as e:
-            print(f"Error reading path {path}: {str(e)}")
-            return []
\ No newline at end of file
+    def get_current_path_files(path, sort="name", on_scan=None):
+        return directory_cache.list(path, sort, on_scan)
@@ -1,5 +1,5 @@
 from main import hw_info, system_lang
-from graphic import screen_resolutions, UserInterface
+from graphic import screen_resolutions, grid_layouts, UserInterface
 from language import Translator
 import os
 import input
@@ -7,6 +7,11 @@ import sys
 import threading
 import time
 from anbernic import Anbernic
+from thumbs import thumbnail_cache, thumbnail_loader
+from listing import SORT_MODES
+from tiles import TilePyramid
+from index import MediaIndex
+from slideshow import ORDERS, Slideshow, collect_images
 
 ver="v1.2"
 translator = Translator(system_lang)
@@ -18,15 +23,37 @@ file_list = []
 menu_deep = [0] * 20
 current_deep = 0
 selected_index = menu_deep[current_deep]
+sort_index = 0
 gr = UserInterface()
 
-slideshow_active = False
-slideshow_index = 0
-slideshow_interval = 3
-last_slide_time = 0
-slideshow_images = []
+slideshow = Slideshow()
+prefetch_ahead = 2
+# Seconds the crossfade between slides takes when enabled
+crossfade_time = 0.4
 
 x_size, y_size, max_elem = screen_resolutions.get(hw_info, (640, 480, 11))
+grid_mode = False
+grid_cols, grid_rows = grid_layouts.get(hw_info, (4, 3))
+grid_page = grid_cols * grid_rows
+# How long to wait for a key before repainting newly generated thumbnails
+grid_refresh = 0.1
+
+# Viewer zoom: None shows the whole image, otherwise a TilePyramid level
+zoom_pyramid = None
+zoom_level = None
+zoom_center = (0.5, 0.5)
+
+media_index = MediaIndex([an.get_sd1_storage_path(), an.get_sd2_storage_path()])
+search_mode = "search"
+search_query = ""
+search_records = None
+search_count = 0
+search_results = []
+search_selected = 0
+search_char = 0
+search_chars = "abcdefghijklmnopqrstuvwxyz0123456789 -_."
+# How often the results screen repaints while the indexer is running
+search_refresh = 0.5
 
 button_x = x_size - 120
 button_y = y_size - 30
@@ -34,6 +61,10 @@ ratio = y_size / x_size
 
 def start():
     print("[INFO]Starting Image Browser...")
+    threading.Thread(target=thumbnail_cache.prune, daemon=True).start()
+    if media_index.exists():
+        # Only once search has been used, so the crawl stays opt-in
+        media_index.refresh()
     gr.draw_log(
         f"{translator.translate('Image Browser')} {ver}", fill=gr.colorBlue, outline=gr.colorBlueD1
     )
@@ -43,11 +74,21 @@ def start():
 
 
 def update() -> None:
-    global current_window, skip_input_check, slideshow_active
+    global current_window, skip_input_check
 
     if skip_input_check:
         input.reset_input()
         skip_input_check = False
+    elif current_window == "browser" and grid_mode and (thumbnail_loader.pending() or thumbnail_loader.ready.is_set()):
+        # Thumbnails are still coming in, repaint for them unless a key arrives first
+        if not input.check(timeout=grid_refresh) and not thumbnail_loader.ready.is_set():
+            return
+    elif current_window == "slideshow":
+        # Sleep until the next slide is due, a key press wakes us up early
+        input.check(timeout=slideshow.time_left())
+    elif current_window == "search" and media_index.running():
+        # Keep results and the indexing counter moving while the crawl runs
+        input.check(timeout=search_refresh)
     else:
         input.check()
 
@@ -67,17 +108,31 @@ def update() -> None:
         handle_image_viewer_input()
     elif current_window == "slideshow":
         handle_slideshow_input()
+    elif current_window == "search":
+        handle_search_input()
     else:
         handle_browser_input()
 
 
 def handle_browser_input() -> None:
-    global current_window, selected_index, current_path, menu_deep, current_deep, skip_input_check, slideshow_active, slideshow_index, slideshow_images, last_slide_time
+    global current_window, selected_index, current_path, menu_deep, current_deep, skip_input_check, sort_index, grid_mode
 
     update_file_list()
 
+    if input.key("L2") or input.key("R2"):
+        open_search("search" if input.key("L2") else "recent")
+        return
+
     if file_list:
-        if input.key("DY"):
+        if grid_mode and input.key("DY"):
+            selected_index = (selected_index + input.value * grid_cols) % len(file_list)
+        elif grid_mode and input.key("DX"):
+            selected_index = (selected_index + input.value) % len(file_list)
+        elif grid_mode and input.key("L1"):
+            selected_index = max(0, selected_index - grid_page)
+        elif grid_mode and input.key("R1"):
+            selected_index = min(len(file_list) - 1, selected_index + grid_page)
+        elif input.key("DY"):
             selected_index = (selected_index + input.value) % len(file_list)
         elif input.key("DX"):
             selected_index = (selected_index + input.value * 5) % len(file_list)
@@ -89,22 +144,22 @@ def handle_browser_input() -> None:
                 selected_index = min(
                     len(file_list) - 1, selected_index + max_elem
                 )
-        elif input.key("X") and file_list[selected_index][2] == "image":
-            slideshow_images = [entry for entry in file_list if entry[2] == "image"]
-            if len(slideshow_images) > 0:
-                slideshow_active = True
-                slideshow_index = slideshow_images.index(file_list[selected_index])
-                last_slide_time = time.time()
-                current_window = "slideshow"
-                enter_fullscreen(slideshow_images[slideshow_index][1], is_slideshow=True)
-                skip_input_check = True
+        elif input.key("X"):
+            # On a folder, play it with all its subfolders
+            entry = file_list[selected_index]
+            if entry[2] == "dir":
+                slides = collect_images(entry[1], recursive=True)
+            else:
+                slides = [item[1] for item in file_list if item[2] == "image"]
+            if slides:
+                start_slideshow(slides, entry[1])
                 return
 
         elif input.key("A"):
             entry_type = file_list[selected_index][2]
             if entry_type == "dir":
                 new_current_path = file_list[selected_index][1]
-                new_file_list = an.get_current_path_files(new_current_path)
+                new_file_list = an.get_current_path_files(new_current_path, SORT_MODES[sort_index], on_scan=show_busy)
                 if len(new_file_list) > 0:
                     menu_deep[current_deep] = selected_index
                     current_deep+=1
@@ -119,6 +174,16 @@ def handle_browser_input() -> None:
             else:
                 enter_fullscreen(file_list[selected_index][1])
                 return
+        elif input.key("START"):
+            grid_mode = not grid_mode
+        elif input.key("SELECT"):
+            selected_path = file_list[selected_index][1]
+            sort_index = (sort_index + 1) % len(SORT_MODES)
+            update_file_list()
+            # Keep the cursor on the same entry in the new order
+            selected_index = next(
+                (i for i, entry in enumerate(file_list) if entry[1] == selected_path), 0
+            )
         elif input.key("B"):
             go_back_directory()
             if current_deep > 0:
@@ -144,8 +209,21 @@ def handle_browser_input() -> None:
         f"{selected_index + 1} / {len(file_list)}",
         anchor="mm",
     )
+    gr.draw_text(
+        (button_x - 10, 20),
+        f"START {translator.translate('List' if grid_mode else 'Grid')}  "
+        f"SELECT {translator.translate('Sort')}: {translator.translate(SORT_MODES[sort_index].capitalize())}",
+        font=15,
+        anchor="rm",
+    )
 
-    if len(file_list) > 0:
+    if len(file_list) > 0 and grid_mode:
+        if selected_index >= len(file_list):
+            selected_index = 0
+        draw_grid()
+        gr.button_circle((210, button_y), "X", f"{translator.translate('Slideshow')}")
+        gr.button_circle((20, button_y), "A", f"{translator.translate('Open')}")
+    elif len(file_list) > 0:
         if selected_index >= len(file_list):
             selected_index = 0
         start_idx = int(selected_index / max_elem) * max_elem
@@ -160,9 +238,9 @@ def handle_browser_input() -> None:
             )
 
         cur_file = file_list[selected_index][2]
+        gr.button_circle((210, button_y), "X", f"{translator.translate('Slideshow')}")
         if cur_file == 'image':
-            gr.preview_image(file_list[selected_index][1], target_x = int(x_size / 2 + 10), target_y = int(y_size / 4), target_width = int(x_size / 2 - 30), target_height = int((x_size / 2 - 30) * ratio))
-            gr.button_circle((210, button_y), "X", f"{translator.translate('Slideshow')}")
+            gr.preview_image(file_list[selected_index][1], mtime=file_list[selected_index][5], size=file_list[selected_index][4], target_x = int(x_size / 2 + 10), target_y = int(y_size / 4), target_width = int(x_size / 2 - 30), target_height = int((x_size / 2 - 30) * ratio))
         gr.button_circle((20, button_y), "A", f"{translator.translate('Open')}")
     else:
         gr.draw_text(
@@ -176,10 +254,48 @@ def handle_browser_input() -> None:
     gr.draw_paint()
 
 
+def draw_grid():
+    thumbnail_loader.ready.clear()
+    cell_width = (x_size - 20) // grid_cols
+    cell_height = (y_size - 85) // grid_rows
+    box = (cell_width - 12, cell_height - 36)
+    start_idx = selected_index // grid_page * grid_page
+
+    for i, entry in enumerate(file_list[start_idx:start_idx + grid_page]):
+        thumb = None
+        if entry[2] == "image":
+            thumb = thumbnail_loader.peek(entry[1], box, entry[5], entry[4])
+        gr.grid_cell(
+            entry[0] if entry[2] == "image" else entry[0][4:],
+            (10 + (i % grid_cols) * cell_width, 42 + (i // grid_cols) * cell_height),
+            (cell_width, cell_height),
+            start_idx + i == selected_index,
+            thumb,
+            entry[2] == "dir",
+        )
+
+    # Visible page first, then the next one and the previous one
+    wanted = []
+    for page_start in (start_idx, start_idx + grid_page, start_idx - grid_page):
+        if 0 <= page_start < len(file_list):
+            wanted += [
+                (entry[1], box, entry[5], entry[4])
+                for entry in file_list[page_start:page_start + grid_page]
+                if entry[2] == "image"
+            ]
+    thumbnail_loader.request(wanted)
+
+
 def handle_image_viewer_input():
     global current_window, selected_index
-    
-    if input.key("DY"):
+
+    if zoom_level is not None:
+        handle_zoom_input()
+        return
+
+    if input.key("R2"):
+        start_zoom()
+    elif input.key("DY"):
         selected_index = (selected_index + input.value) % len(file_list)
         enter_fullscreen(file_list[selected_index][1])
     elif input.key("DX"):
@@ -199,44 +315,282 @@ def handle_image_viewer_input():
         exit_fullscreen()
 
 
-def handle_slideshow_input():
-    global slideshow_active, slideshow_index, current_window, last_slide_time, selected_index, slideshow_images, slideshow_interval, skip_input_check
-    input.reset_input()
-    thread = threading.Thread(target=input.check)
-    thread.start()
-    
-    while True:
-        current_time = time.time()
-        if current_time - last_slide_time >= slideshow_interval:
-            slideshow_index = (slideshow_index + 1) % len(slideshow_images)
-            last_slide_time = time.time()
-            enter_fullscreen(slideshow_images[slideshow_index][1], is_slideshow=True)
-        elif input.slide_key():
-            slideshow_active = False
-            current_window = "browser"
-            if len(slideshow_images)>1:
-                selected_index = slideshow_index
-            skip_input_check = True
+def start_zoom():
+    global zoom_pyramid, zoom_level, zoom_center
+    image_path = file_list[selected_index][1]
+    screen = (x_size, y_size)
+    if zoom_pyramid is None or zoom_pyramid.path != image_path:
+        zoom_pyramid = None
+        gr.button_circle((20, 6), " ", " ", color=gr.colorRed)
+        gr.draw_paint()
+        try:
+            zoom_pyramid = TilePyramid(image_path, screen)
+        except Exception as e:
+            print(f"[ERROR]Cannot zoom into {image_path}: {e}")
+            enter_fullscreen(image_path)
             return
+    levels = zoom_pyramid.zoom_levels(screen)
+    if not levels:
+        # Already shown at full size
+        enter_fullscreen(image_path)
+        return
+    zoom_level = levels[0]
+    zoom_center = zoom_pyramid.clamp(zoom_level, (0.5, 0.5), screen)
+    gr.display_tiles(zoom_pyramid, zoom_level, zoom_center)
+
+def handle_zoom_input():
+    global zoom_level, zoom_center
+    screen = (x_size, y_size)
+    levels = zoom_pyramid.zoom_levels(screen)
+    position = levels.index(zoom_level)
+    width, height = zoom_pyramid.levels[zoom_level][:2]
+
+    if input.key("R2"):
+        if position + 1 < len(levels):
+            zoom_level = levels[position + 1]
+    elif input.key("L2"):
+        if position == 0:
+            stop_zoom()
+            return
+        zoom_level = levels[position - 1]
+    elif input.key("DX"):
+        # Half a screen per press
+        zoom_center = (zoom_center[0] + input.value * x_size / 2 / width, zoom_center[1])
+    elif input.key("DY"):
+        zoom_center = (zoom_center[0], zoom_center[1] + input.value * y_size / 2 / height)
+    elif input.key("B"):
+        stop_zoom()
+        return
+    else:
+        return
+    zoom_center = zoom_pyramid.clamp(zoom_level, zoom_center, screen)
+    gr.display_tiles(zoom_pyramid, zoom_level, zoom_center)
+
+def stop_zoom():
+    global zoom_level
+    zoom_level = None
+    enter_fullscreen(file_list[selected_index][1])
 
-def enter_fullscreen(image_path, is_slideshow=False):
+def start_slideshow(slides, first):
     global current_window
-    if not is_slideshow:
-        current_window = "image_viewer"
+    slideshow.start(slides, first)
+    current_window = "slideshow"
+    show_slide()
+
+def show_slide(fade=0):
     gr.draw_clear()
-    gr.display_image(image_path)
+    gr.display_image(slideshow.current(), fade=fade)
+    gr.prefetcher.prefetch(slideshow.upcoming(prefetch_ahead))
+
+def show_slideshow_notice(text):
+    # Drawn over the current slide, the next slide replaces it
+    gr.draw_log(text, fill=gr.colorBlue, outline=gr.colorBlueD1)
     gr.draw_paint()
 
+def handle_slideshow_input():
+    global current_window, selected_index, skip_input_check
+
+    if input.key("L1") or input.key("R1"):
+        slideshow.set_interval(slideshow.interval + (1 if input.key("R1") else -1))
+        show_slideshow_notice(f"{translator.translate('Interval')}: {slideshow.interval}s")
+    elif input.key("SELECT"):
+        slideshow.set_order(ORDERS[(ORDERS.index(slideshow.order) + 1) % len(ORDERS)])
+        gr.prefetcher.prefetch(slideshow.upcoming(prefetch_ahead))
+        show_slideshow_notice(translator.translate(slideshow.order.capitalize()))
+    elif input.key("START"):
+        slideshow.crossfade = not slideshow.crossfade
+        slideshow.save()
+        show_slideshow_notice(f"{translator.translate('Crossfade')}: {translator.translate('On' if slideshow.crossfade else 'Off')}")
+    elif input.key("DX") or input.key("DY"):
+        slideshow.step(input.value)
+        slideshow.schedule()
+        show_slide()
+    elif input.codeName:
+        current_window = "browser"
+        # Put the cursor on the last slide if it is in the current folder
+        selected_index = next(
+            (i for i, entry in enumerate(file_list) if entry[1] == slideshow.current()), selected_index
+        )
+        skip_input_check = True
+    elif slideshow.due() and len(slideshow.paths) > 1:
+        slideshow.step()
+        show_slide(crossfade_time if slideshow.crossfade else 0)
+
+def enter_fullscreen(image_path):
+    global current_window
+    current_window = "image_viewer"
+    gr.draw_clear()
+    gr.display_image(image_path)
+    prefetch_neighbours()
+
+def prefetch_neighbours():
+    # Closest images on both sides first, skipping folders in the list
+    paths = []
+    images = [i for i, entry in enumerate(file_list) if entry[2] == "image"]
+    if selected_index in images and len(images) > 1:
+        pos = images.index(selected_index)
+        for step in range(1, prefetch_ahead + 1):
+            for direction in (1, -1):
+                path = file_list[images[(pos + direction * step) % len(images)]][1]
+                if path not in paths and path != file_list[selected_index][1]:
+                    paths.append(path)
+    gr.prefetcher.prefetch(paths)
+
 def exit_fullscreen():
-    global current_window, skip_input_check
+    global current_window, skip_input_check, zoom_pyramid
     current_window = "browser"
+    # Tiles can take tens of MB, don't keep them around in the browser
+    zoom_pyramid = None
     skip_input_check = True
 
-def update_file_list():
-    global current_path, file_list
+def show_busy():
     gr.button_circle((20, 6), " ", " ", color=gr.colorRed)
     gr.draw_paint()
-    file_list = an.get_current_path_files(current_path)
+
+def open_search(mode):
+    global current_window, search_mode, search_records, search_selected, skip_input_check
+    search_mode = mode
+    search_records = None
+    search_selected = 0
+    current_window = "search"
+    media_index.refresh()
+    skip_input_check = True
+
+def run_search():
+    global search_records, search_count, search_results
+    search_records, search_count = media_index.snapshot()
+    visible = search_records[:search_count]
+    if search_mode == "recent":
+        search_results = media_index.recent(within=visible)
+    elif search_query:
+        search_results = media_index.search(search_query, within=visible)
+    else:
+        search_results = []
+
+def extend_search(new_records):
+    """Fold records the first crawl appended since the last look into the results"""
+    global search_results
+    if search_mode == "recent":
+        search_results = media_index.recent(within=search_results + new_records)
+    elif search_query:
+        search_results = search_results + media_index.search(search_query, within=new_records)
+
+def handle_search_input():
+    global current_window, search_count, skip_input_check, search_query, search_results, search_selected, search_char
+
+    records, visible = media_index.snapshot()
+    if records is not search_records:
+        run_search()
+    elif visible != search_count:
+        extend_search(records[search_count:visible])
+        search_count = visible
+
+    if input.key("B"):
+        current_window = "browser"
+        skip_input_check = True
+        return
+    elif input.key("START") and search_results:
+        go_to_image(search_results[search_selected][1])
+        return
+    elif input.key("DY") and search_results:
+        search_selected = (search_selected + input.value) % len(search_results)
+    elif input.key("L1"):
+        search_selected = max(0, search_selected - max_elem)
+    elif input.key("R1") and search_results:
+        search_selected = min(len(search_results) - 1, search_selected + max_elem)
+    elif search_mode == "search":
+        if input.key("DX"):
+            search_char = (search_char + input.value) % len(search_chars)
+        elif input.key("A"):
+            search_query += search_chars[search_char]
+            # A longer query can only narrow the previous matches
+            search_results = media_index.search(search_query, within=search_results if len(search_query) > 1 else search_records[:search_count])
+            search_selected = 0
+        elif input.key("Y") and search_query:
+            search_query = search_query[:-1]
+            run_search()
+            search_selected = 0
+
+    if search_selected >= len(search_results):
+        search_selected = 0
+    draw_search()
+
+def draw_search():
+    gr.draw_clear()
+    gr.draw_rectangle_r([10, 40, x_size-10, y_size-40], 15, fill=gr.colorGrayD2, outline=None)
+    if search_mode == "search":
+        title = f"{translator.translate('Search')}: {search_query}_"
+    else:
+        title = translator.translate('Recent images')
+    if media_index.running():
+        title += f"  ({translator.translate('Indexing...')} {media_index.progress})"
+    gr.draw_text((50, 20), title, font=19, anchor="lm")
+    gr.draw_text(
+        (button_x + 50, 20),
+        f"{search_selected + 1 if search_results else 0} / {len(search_results)}",
+        anchor="mm",
+    )
+
+    rows = max_elem
+    list_y = 50
+    if search_mode == "search":
+        # Character picker, selected character in the middle
+        rows -= 1
+        list_y = 85
+        visible = (x_size - 40) // 30
+        for i in range(visible):
+            char_index = (search_char - visible // 2 + i) % len(search_chars)
+            char_x = 20 + i * 30
+            if char_index == search_char:
+                gr.draw_rectangle_r([char_x, 45, char_x + 28, 77], 5, fill=gr.colorBlue)
+            if search_chars[char_index] == " ":
+                gr.draw_text((char_x + 14, 61), "SP", font=13, anchor="mm")
+            else:
+                gr.draw_text((char_x + 14, 61), search_chars[char_index], anchor="mm")
+
+    if search_results:
+        start_idx = int(search_selected / rows) * rows
+        for i, record in enumerate(search_results[start_idx:start_idx + rows]):
+            name = os.path.basename(record[1])
+            name = name[:34] + "..." if len(name) > 36 else name
+            if record[4]:
+                name += f"  {record[4]}x{record[5]}"
+            gr.row_list(name, (20, list_y + (i * 35)), x_size - 40, i == (search_selected % rows))
+        record = search_results[search_selected]
+        gr.preview_image(record[1], mtime=record[3], size=record[2], target_x = int(x_size / 2 + 10), target_y = int(y_size / 4), target_width = int(x_size / 2 - 30), target_height = int((x_size / 2 - 30) * ratio))
+        gr.button_rectangle((button_x-200, button_y), "START", f"{translator.translate('Go to')}")
+    elif not media_index.running():
+        gr.draw_text((x_size / 2, y_size / 2), f"{translator.translate('No valid file found!')}", anchor="mm")
+
+    if search_mode == "search":
+        gr.button_circle((20, button_y), "A", f"{translator.translate('Type')}")
+        gr.button_circle((210, button_y), "Y", f"{translator.translate('Delete')}")
+    gr.button_circle((120, button_y), "B", f"{translator.translate('Back')}")
+    gr.draw_paint()
+
+def go_to_image(image_path):
+    """Open the folder holding image_path in the browser, with the image selected"""
+    global current_window, current_path, current_deep, menu_deep, selected_index, skip_input_check
+    folder = os.path.dirname(image_path)
+    root = an.get_sd2_storage_path() if folder.startswith(an.get_sd2_storage_path()) else an.get_sd1_storage_path()
+    an.set_sd_storage(2 if root == an.get_sd2_storage_path() else 1)
+    current_path = folder
+    relative = os.path.relpath(folder, root)
+    current_deep = 0 if relative == "." else min(len(relative.split(os.sep)), len(menu_deep) - 1)
+    menu_deep = [0] * 20
+    update_file_list()
+    selected_index = next((i for i, entry in enumerate(file_list) if entry[1] == image_path), 0)
+    menu_deep[current_deep] = selected_index
+    current_window = "browser"
+    skip_input_check = True
+
+def update_file_list():
+    # One stat of the folder per call; it is only read again when its mtime changed
+    global file_list, selected_index
+    file_list = an.get_current_path_files(current_path, SORT_MODES[sort_index], on_scan=show_busy)
+    if selected_index >= len(file_list):
+        # Files were removed from the folder while it was shown
+        selected_index = max(0, len(file_list) - 1)
 
 def go_back_directory():
     global current_path, current_deep
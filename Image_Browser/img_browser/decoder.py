@@ -0,0 +1,37 @@
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from prefetch import available_memory
+
+# Never hold more decoded pixels than this, a 4-byte pixel each
+max_pixels = min(max(available_memory() // 4 // 4, 16_000_000), 64_000_000)
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def open_scaled(path: str, box: Tuple[int, int], pixel_limit: Optional[int] = None) -> Image.Image:
+    """Decode path at the smallest size that still covers box.
+
+    JPEG is decoded at 1/2, 1/4 or 1/8 scale by the DCT itself (draft), other
+    formats are decoded in full and shrunk with an integer reduce, so the final
+    LANCZOS resize only works on roughly screen-sized data. Images above the
+    pixel ceiling are refused before anything is decoded.
+    """
+    pixel_limit = pixel_limit or max_pixels
+    box = (max(1, int(box[0])), max(1, int(box[1])))
+    img = Image.open(path)
+    if img.format == "JPEG":
+        img.draft("RGB", box)
+    if img.width * img.height > pixel_limit:
+        raise ImageTooLarge(f"{img.width}x{img.height} is above the {pixel_limit} pixel limit")
+    img.load()
+    factor = min(img.width // box[0], img.height // box[1])
+    if factor >= 2:
+        if img.mode not in ("L", "LA", "RGB", "RGBA", "RGBX", "CMYK", "YCbCr"):
+            # Palette and 1-bit images can't be reduced directly
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        img = img.reduce(factor)
+    return img
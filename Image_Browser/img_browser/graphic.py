@@ -1,7 +1,12 @@
 import ctypes
 import os
+import time
+from functools import lru_cache
 from main import hw_info
 from typing import Optional
+from thumbs import thumbnail_cache
+from prefetch import ImagePrefetcher
+from decoder import open_scaled
 
 import sdl2
 from PIL import Image, ImageDraw, ImageFont
@@ -18,6 +23,17 @@ screen_resolutions = {
     2: (720, 480, 11)
 }
 
+# Thumbnail grid columns and rows, 4x3 elsewhere
+grid_layouts = {
+    1: (5, 5),
+    2: (5, 3)
+}
+
+
+@lru_cache(maxsize=None)
+def load_font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_file, size)
+
 class UserInterface:
     _instance: Optional["UserInterface"] = None
     _initialized: bool = False
@@ -41,8 +57,10 @@ class UserInterface:
             return
         self.window = self._create_window()
         self.renderer = self._create_renderer()
+        self.last_texture = None
         self.draw_start()
         self.opt_stretch = True
+        self.prefetcher = ImagePrefetcher(self.render_fullscreen)
         self._initialized = True
 
     def __new__(cls):
@@ -98,7 +116,33 @@ class UserInterface:
         sdl2.SDL_SetHint(sdl2.SDL_HINT_RENDER_SCALE_QUALITY, b"0")
         return renderer
 
-    def draw_paint(self):
+    def draw_paint(self, fade: float = 0):
+        """Present the active image, cross-fading from the last frame over fade seconds"""
+        texture, dst_rect = self._create_texture()
+        if fade > 0 and self.last_texture:
+            # The GPU blends the two textures, PIL never touches the pixels
+            sdl2.SDL_SetTextureBlendMode(texture, sdl2.SDL_BLENDMODE_BLEND)
+            start = time.monotonic()
+            while True:
+                progress = min(1.0, (time.monotonic() - start) / fade)
+                sdl2.SDL_RenderClear(self.renderer)
+                sdl2.SDL_RenderCopy(self.renderer, self.last_texture, None, dst_rect)
+                sdl2.SDL_SetTextureAlphaMod(texture, int(255 * progress))
+                sdl2.SDL_RenderCopy(self.renderer, texture, None, dst_rect)
+                sdl2.SDL_RenderPresent(self.renderer)
+                if progress >= 1.0:
+                    break
+                time.sleep(1 / 60)
+            sdl2.SDL_SetTextureAlphaMod(texture, 255)
+        else:
+            sdl2.SDL_RenderCopy(self.renderer, texture, None, dst_rect)
+            sdl2.SDL_RenderPresent(self.renderer)
+        # Kept as the starting point of the next fade
+        if self.last_texture:
+            sdl2.SDL_DestroyTexture(self.last_texture)
+        self.last_texture = texture
+
+    def _create_texture(self):
         # Convert PIL image to SDL2 texture at base resolution
         if hw_info == 3:
             rotated_image = self.active_image.rotate(90, expand=True)
@@ -140,11 +184,11 @@ class UserInterface:
         else:
             dst_rect = sdl2.SDL_Rect(0, 0, window_width, window_height)
 
-        sdl2.SDL_RenderCopy(self.renderer, texture, None, dst_rect)
-        sdl2.SDL_RenderPresent(self.renderer)
-        sdl2.SDL_DestroyTexture(texture)
+        return texture, dst_rect
 
     def draw_end(self):
+        if self.last_texture:
+            sdl2.SDL_DestroyTexture(self.last_texture)
         sdl2.SDL_DestroyRenderer(self.renderer)
         sdl2.SDL_DestroyWindow(self.window)
         sdl2.SDL_Quit()
@@ -167,7 +211,7 @@ class UserInterface:
         **kwargs,
     ):
         self.active_draw.text(
-            position, text, font=ImageFont.truetype(font_file, font), fill=color, **kwargs
+            position, text, font=load_font(font), fill=color, **kwargs
         )
 
     def draw_rectangle(
@@ -196,6 +240,31 @@ class UserInterface:
         )
         self.draw_text((pos[0] + 5, pos[1] + 5), text)
 
+    def grid_cell(self, text: str, pos: tuple[int, int], size: tuple[int, int], selected: bool,
+                  thumb: Optional[Image.Image] = None, is_dir: bool = False) -> None:
+        """One grid tile: the thumbnail, or a placeholder until it is ready, over a name"""
+        x, y = pos
+        width, height = size
+        thumb_height = height - 30
+        self.draw_rectangle_r(
+            [x + 2, y + 2, x + width - 2, y + height - 2],
+            5,
+            fill=(self.colorBlue if selected else self.colorGrayL1),
+        )
+        if thumb is not None:
+            self.active_image.paste(
+                thumb, (x + (width - thumb.width) // 2, y + 4 + (thumb_height - thumb.height) // 2)
+            )
+        else:
+            self.draw_rectangle_r(
+                [x + 8, y + 6, x + width - 8, y + thumb_height], 5, fill=self.colorGrayD2
+            )
+            self.draw_text((x + width / 2, y + 4 + thumb_height / 2), "[+]" if is_dir else "...", anchor="mm")
+        max_chars = max(4, width // 9)
+        if len(text) > max_chars:
+            text = text[:max_chars - 2] + ".."
+        self.draw_text((x + width / 2, y + height - 14), text, font=15, anchor="mm")
+
     def draw_circle(
         self,
         position,
@@ -353,38 +422,75 @@ class UserInterface:
         self.draw_text((pos[0] + 30, pos[1] + 12), button, anchor="mm")
         self.draw_text((pos[0] + 65, pos[1] + 12), text, font=19, anchor="lm")
 
-    def display_image(self, image_path,
-                    target_width=None, target_height=None, 
+    def render_fullscreen(self, image_path,
+                    target_width=None, target_height=None,
                     zoom=None, rotation=0):
+        """Decode and scale an image into the frame pasted by display_image.
+
+        Only touches PIL, so the prefetcher can call it from its worker thread.
+        """
         if hw_info == 3 and '/anbernic/bootlogo/' in image_path:
             target_width = 480
             target_height = 640
-        img = Image.open(image_path)
-        if rotation != 0:
-            img = img.rotate(rotation, expand=True)
-        if zoom is None:
-            x_zoom = self.screen_width / img.width
-            y_zoom = self.screen_height / img.height
-            zoom = min(x_zoom, y_zoom)
-        if target_width is None:
-            target_width = int(img.width * zoom)
-        if target_height is None:
-            target_height = int(img.height * zoom)
-        img = img.resize((target_width, target_height), Image.LANCZOS)
-        paste_x = (self.screen_width - target_width) // 2
-        paste_y = (self.screen_height - target_height) // 2
+        try:
+            if zoom is not None:
+                # Zoom is relative to the file's own size, read from the header only
+                with Image.open(image_path) as header:
+                    source_width, source_height = header.size
+                if rotation % 180 == 90:
+                    source_width, source_height = source_height, source_width
+                target_width = target_width or int(source_width * zoom)
+                target_height = target_height or int(source_height * zoom)
+            decode_box = (target_width or self.screen_width, target_height or self.screen_height)
+            if rotation % 180 == 90:
+                decode_box = (decode_box[1], decode_box[0])
+            img = open_scaled(image_path, decode_box)
+            if rotation != 0:
+                img = img.rotate(rotation, expand=True)
+            if zoom is None:
+                x_zoom = self.screen_width / img.width
+                y_zoom = self.screen_height / img.height
+                zoom = min(x_zoom, y_zoom)
+            if target_width is None:
+                target_width = int(img.width * zoom)
+            if target_height is None:
+                target_height = int(img.height * zoom)
+            img = img.resize((target_width, target_height), Image.LANCZOS)
+        except Exception as e:
+            print(f"[ERROR]Cannot display {image_path}: {e}")
+            return None
         if hw_info == 3 and '/anbernic/bootlogo/' in image_path:
             img = img.rotate(-90, expand=True)
-        self.active_image.paste(img, (paste_x, paste_y))
-        self.draw_paint()
+        return img
+
+    def display_image(self, image_path,
+                    target_width=None, target_height=None, 
+                    zoom=None, rotation=0, fade=0):
+        if target_width is None and target_height is None and zoom is None and rotation == 0:
+            img = self.prefetcher.get(image_path)
+        else:
+            img = self.render_fullscreen(image_path, target_width, target_height, zoom, rotation)
+        if img is not None:
+            paste_x = (self.screen_width - img.width) // 2
+            paste_y = (self.screen_height - img.height) // 2
+            self.active_image.paste(img, (paste_x, paste_y))
+        self.draw_paint(fade)
     
-    def preview_image(self, image_path, target_x=0, target_y=0, target_width=None, target_height=None):
+    def display_tiles(self, pyramid, level, center):
+        """Composite the visible tiles of a TilePyramid level, nothing is resized"""
+        self.draw_clear()
+        for tile, pos in pyramid.visible(level, center, (self.screen_width, self.screen_height)):
+            self.active_image.paste(tile, pos)
+        self.draw_paint()
+
+    def preview_image(self, image_path, target_x=0, target_y=0, target_width=None, target_height=None, mtime=None, size=None):
         if target_width is None:
             target_width = self.screen_width - target_x
         if target_height is None:
             target_height = self.screen_height - target_y
-        img = Image.open(image_path)
-        img.thumbnail((target_width, target_height))
+        img = thumbnail_cache.get(image_path, (target_width, target_height), mtime, size)
+        if img is None:
+            return
         paste_x = target_x + (target_width - img.width) // 2
         paste_y = target_y + (target_height - img.height) // 2
         if hw_info == 3 and '/anbernic/bootlogo/' in image_path:
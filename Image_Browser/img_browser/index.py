@@ -0,0 +1,215 @@
+import gzip
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from listing import IMAGE_EXTENSIONS
+
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+index_path = os.path.join(cache_dir, "index.json.gz")
+INDEX_VERSION = 1
+PUBLISH_INTERVAL = 0.5
+
+# (lowercase name, path, size, mtime, width, height)
+Record = Tuple[str, str, int, float, int, int]
+
+
+class MediaIndex:
+    """Every image on the given roots, crawled in the background and kept on the card.
+
+    The index stores, per directory, its mtime, its subdirectories and its
+    images with size, mtime and dimensions. A refresh lists only directories
+    whose mtime changed; in the others each known image is stat'ed, since an
+    image edited in place does not touch its folder. Image headers are read
+    again only for files whose size or mtime changed.
+
+    Without a saved index, records are appended to the published list as
+    folders are crawled and made visible every PUBLISH_INTERVAL seconds, so
+    a first run fills search and recent as it goes; readers pick up the
+    tail past what they have seen. A refresh of an existing index swaps in
+    the new list once, at the end.
+    """
+
+    def __init__(self, roots: List[str], path: str = index_path):
+        self.roots = roots
+        self.path = path
+        self.progress = 0
+        self.__dirs: Dict[str, dict] = {}
+        self.__records: List[Record] = []
+        self.__visible = 0
+        self.__complete = False
+        self.__loaded = False
+        self.__thread: Optional[threading.Thread] = None
+        self.__lock = threading.Lock()
+
+    def load(self) -> None:
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.__dirs = data["dirs"]
+                self.__publish(self.build_records(self.__dirs), len(self.__dirs) > 0)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[INFO]No usable image index, building a new one: {e}")
+        self.__loaded = True
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "dirs": self.__dirs}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[ERROR]Cannot write image index {self.path}: {e}")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def refresh(self) -> None:
+        """Start a background crawl unless one is already running"""
+        if self.running():
+            return
+        self.__thread = threading.Thread(target=self.__crawl, daemon=True)
+        self.__thread.start()
+
+    def __crawl(self) -> None:
+        if not self.__loaded:
+            self.load()
+        old_dirs = self.__dirs
+        dirs: Dict[str, dict] = {}
+        records: List[Record] = []
+        # A first run shows the records as they come, a refresh keeps the old ones until it ends
+        incremental = not old_dirs
+        if incremental:
+            self.__publish(records, False)
+        changed = False
+        self.progress = 0
+        published = time.monotonic()
+        stack = [root for root in self.roots if os.path.isdir(root)]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                changed = True
+                continue
+            entry = old_dirs.get(path)
+            if entry is None or entry["mtime"] != mtime:
+                entry = self.scan(path, mtime, entry)
+                changed = True
+            elif self.restat(path, entry):
+                changed = True
+            dirs[path] = entry
+            with self.__lock:
+                records.extend(self.dir_records(path, entry))
+            self.progress += len(entry["files"])
+            stack.extend(
+                os.path.join(path, name) for name in entry["subdirs"]
+                # Our own thumbnails live on the card too
+                if os.path.join(path, name) != cache_dir
+            )
+            if incremental and time.monotonic() - published >= PUBLISH_INTERVAL:
+                self.__publish(records, False)
+                published = time.monotonic()
+
+        if changed or len(dirs) != len(old_dirs):
+            self.__dirs = dirs
+            self.__publish(records, True)
+            self.save()
+        elif incremental:
+            self.__publish(records, True)
+        print(f"[INFO]Indexed {self.progress} images in {len(dirs)} folders")
+
+    @staticmethod
+    def restat(path: str, entry: dict) -> bool:
+        """Refresh the images of an unchanged folder that were edited in place, True if any was"""
+        changed = False
+        for item in entry["files"]:
+            try:
+                stat = os.stat(os.path.join(path, item[0]))
+            except OSError:
+                # Removing a file changes the folder mtime, it is rescanned next time
+                continue
+            if item[1] != stat.st_size or item[2] != stat.st_mtime:
+                width, height = image_size(os.path.join(path, item[0]))
+                item[1:] = [stat.st_size, stat.st_mtime, width, height]
+                changed = True
+        return changed
+
+    @staticmethod
+    def scan(path: str, mtime: int, old: Optional[dict]) -> dict:
+        known = {item[0]: item for item in old["files"]} if old else {}
+        subdirs: List[str] = []
+        files: List[list] = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            stat = entry.stat()
+                            item = known.get(entry.name)
+                            if item is None or item[1] != stat.st_size or item[2] != stat.st_mtime:
+                                width, height = image_size(entry.path)
+                                item = [entry.name, stat.st_size, stat.st_mtime, width, height]
+                            files.append(item)
+                    except OSError as e:
+                        print(f"[ERROR]Skipping {entry.path}: {e}")
+        except OSError as e:
+            print(f"[ERROR]Error indexing {path}: {e}")
+        return {"mtime": mtime, "subdirs": subdirs, "files": files}
+
+    @staticmethod
+    def dir_records(path: str, entry: dict) -> List[Record]:
+        return [(item[0].lower(), os.path.join(path, item[0]), item[1], item[2], item[3], item[4]) for item in entry["files"]]
+
+    @classmethod
+    def build_records(cls, dirs: Dict[str, dict]) -> List[Record]:
+        return [record for path, entry in dirs.items() for record in cls.dir_records(path, entry)]
+
+    def __publish(self, records: List[Record], final: bool) -> None:
+        with self.__lock:
+            self.__records = records
+            self.__visible = len(records)
+            self.__complete = final
+
+    def records(self) -> List[Record]:
+        """Published records; while a first crawl runs, more are appended to the same list"""
+        with self.__lock:
+            return self.__records[:self.__visible] if not self.__complete else self.__records
+
+    def snapshot(self) -> Tuple[List[Record], int]:
+        """The published list and how many of its records are visible; a new list means start over"""
+        with self.__lock:
+            return self.__records, self.__visible
+
+    def search(self, query: str, within: Optional[List[Record]] = None) -> List[Record]:
+        """Records whose name contains query; pass the previous result when the query only grew"""
+        query = query.lower()
+        source = within if within is not None else self.records()
+        return [record for record in source if query in record[0]]
+
+    def recent(self, limit: int = 200, within: Optional[List[Record]] = None) -> List[Record]:
+        source = within if within is not None else self.records()
+        return heapq.nlargest(limit, source, key=lambda record: record[3])
+
+
+def image_size(path: str) -> Tuple[int, int]:
+    """Dimensions from the file header, 0x0 if it can't be read"""
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return 0, 0
@@ -1,4 +1,6 @@
+import select
 import struct
+import time
 
 code = 0
 codeName = ""
@@ -22,21 +24,32 @@ mapping = {
     115: "V-",
 }
 
-def check():
-    global type, code, codeName, codeDown, value, valueDown
-    with open("/dev/input/event1", "rb") as f:
-        while True:
-            event = f.read(24)
-            
-            if event:
-                (tv_sec, tv_usec, type, kcode, kvalue) = struct.unpack('llHHI', event)
-                if kvalue != 0:
-                    if kvalue != 1:
-                        kvalue = -1
-                    code = kcode
-                    codeName = mapping.get(code, str(code))
-                    value = kvalue                        
-                    return
+device = None
+
+def check(timeout=None):
+    """Wait for a key press, True when one arrived, False once timeout seconds passed"""
+    global type, code, codeName, codeDown, value, valueDown, device
+    if device is None:
+        # Unbuffered and kept open, so select() sees exactly what read() would
+        device = open("/dev/input/event1", "rb", buffering=0)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([device], [], [], remaining)[0]:
+                reset_input()
+                return False
+        event = device.read(24)
+
+        if event:
+            (tv_sec, tv_usec, type, kcode, kvalue) = struct.unpack('llHHI', event)
+            if kvalue != 0:
+                if kvalue != 1:
+                    kvalue = -1
+                code = kcode
+                codeName = mapping.get(code, str(code))
+                value = kvalue
+                return True
 
 def key(keyCodeName, keyValue = 99):
     global code, codeName, value
@@ -45,11 +58,6 @@ def key(keyCodeName, keyValue = 99):
             return value == keyValue
         return True
 
-def slide_key():
-    global codeName
-    if codeName:
-        return True
-
 def reset_input():
     global codeName, value
     codeName = ""
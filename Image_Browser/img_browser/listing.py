@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+SORT_MODES = ["name", "date", "size"]
+
+# (label, full path, "dir"/"image", lowercase name, size, mtime)
+Entry = Tuple[str, str, str, str, int, float]
+
+
+class DirectoryCache:
+    """Folder listings read with os.scandir and kept per directory.
+
+    A listing is rebuilt only when the directory mtime changes, which is one
+    stat per lookup; sizes and mtimes are taken from the same scan so sorting
+    by them needs no further calls. Sorted views are kept too, so switching
+    the sort order back and forth does not sort again.
+    """
+
+    def __init__(self, max_dirs: int = 32):
+        self.max_dirs = max_dirs
+        self.__dirs: "OrderedDict[str, dict]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self.__lock:
+            if path is None:
+                self.__dirs.clear()
+            else:
+                self.__dirs.pop(path, None)
+
+    def list(self, path: str, sort: str = "name", on_scan: Optional[Callable[[], None]] = None) -> List[Entry]:
+        """Sorted entries of path, on_scan is called only when the folder is actually read"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            print(f"[ERROR]Error reading path {path}: {e}")
+            self.invalidate(path)
+            return []
+
+        with self.__lock:
+            cached = self.__dirs.get(path)
+            if cached is not None and cached["mtime"] == mtime:
+                self.__dirs.move_to_end(path)
+            else:
+                cached = None
+
+        if cached is None:
+            if on_scan:
+                on_scan()
+            cached = {"mtime": mtime, "entries": self.scan(path), "sorted": {}}
+            with self.__lock:
+                self.__dirs[path] = cached
+                while len(self.__dirs) > self.max_dirs:
+                    self.__dirs.popitem(last=False)
+
+        views: Dict[str, List[Entry]] = cached["sorted"]
+        if sort not in views:
+            views[sort] = self.sort(cached["entries"], sort)
+        return views[sort]
+
+    @staticmethod
+    def scan(path: str) -> List[Entry]:
+        entries: List[Entry] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        # d_type answers is_dir without a stat on most filesystems
+                        if entry.is_dir():
+                            stat = entry.stat()
+                            entries.append(("[+] " + entry.name, entry.path, "dir", entry.name.lower(), 0, stat.st_mtime))
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            stat = entry.stat()
+                            entries.append((entry.name, entry.path, "image", entry.name.lower(), stat.st_size, stat.st_mtime))
+                    except OSError as e:
+                        print(f"[ERROR]Skipping {entry.path}: {e}")
+        except OSError as e:
+            print(f"[ERROR]Error reading path {path}: {e}")
+        print(f"[INFO]Listed {len(entries)} entries in {path}")
+        return entries
+
+    @staticmethod
+    def sort(entries: List[Entry], sort: str) -> List[Entry]:
+        dirs = [entry for entry in entries if entry[2] == "dir"]
+        images = [entry for entry in entries if entry[2] == "image"]
+        dirs.sort(key=lambda x: x[3])
+        images.sort(key=lambda x: x[3])
+        # Stable sorts, so equal sizes or dates stay in name order
+        if sort == "date":
+            dirs.sort(key=lambda x: x[5], reverse=True)
+            images.sort(key=lambda x: x[5], reverse=True)
+        elif sort == "size":
+            images.sort(key=lambda x: x[4], reverse=True)
+        return dirs + images
+
+
+directory_cache = DirectoryCache()
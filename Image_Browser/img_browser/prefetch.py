@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image
+
+
+def available_memory() -> int:
+    """MemAvailable from /proc/meminfo in bytes, a conservative guess if unreadable"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 256 * 1024 * 1024
+
+
+# (path, mtime_ns, size): a file replaced or edited on the card gets a new key
+FrameKey = Tuple[str, int, int]
+
+
+def frame_key(path: str) -> FrameKey:
+    try:
+        st = os.stat(path)
+        return path, st.st_mtime_ns, st.st_size
+    except OSError:
+        return path, 0, 0
+
+
+def image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class ImagePrefetcher:
+    """Screen-sized frames decoded ahead of time on a worker thread.
+
+    render(path) turns a file into the frame that is pasted on screen. Frames
+    are kept in an LRU keyed by path, mtime and size, bounded in bytes, by default an eighth of the available
+    RAM between 8 and 128 MB, so showing a prefetched image only costs the
+    texture upload.
+    """
+
+    def __init__(self, render: Callable[[str], Optional[Image.Image]], budget_bytes: Optional[int] = None):
+        self.render = render
+        if budget_bytes is None:
+            budget_bytes = min(max(available_memory() // 8, 8 * 1024 * 1024), 128 * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self.__frames: "OrderedDict[FrameKey, Optional[Image.Image]]" = OrderedDict()
+        self.__bytes = 0
+        self.__pending: List[FrameKey] = []
+        self.__decoding: Optional[FrameKey] = None
+        self.__cond = threading.Condition()
+        self.__worker = threading.Thread(target=self.__run, daemon=True)
+        self.__worker.start()
+
+    def __store(self, key: FrameKey, img: Optional[Image.Image]) -> None:
+        if key in self.__frames:
+            return
+        self.__frames[key] = img
+        self.__bytes += image_bytes(img) if img else 0
+        while self.__bytes > self.budget_bytes and len(self.__frames) > 1:
+            _, old = self.__frames.popitem(last=False)
+            self.__bytes -= image_bytes(old) if old else 0
+
+    def get(self, path: str) -> Optional[Image.Image]:
+        """Frame for path, waiting for the worker if it is decoding it right now"""
+        key = frame_key(path)
+        with self.__cond:
+            while self.__decoding == key:
+                self.__cond.wait()
+            if key in self.__frames:
+                self.__frames.move_to_end(key)
+                return self.__frames[key]
+            if key in self.__pending:
+                self.__pending.remove(key)
+
+        img = self.render(path)
+        with self.__cond:
+            self.__store(key, img)
+        return img
+
+    def prefetch(self, paths: List[str]) -> None:
+        """Replace the queue with paths, most wanted first"""
+        keys = [frame_key(path) for path in paths]
+        with self.__cond:
+            self.__pending = [key for key in keys if key not in self.__frames]
+            self.__cond.notify_all()
+
+    def clear(self) -> None:
+        with self.__cond:
+            self.__frames.clear()
+            self.__pending = []
+            self.__bytes = 0
+
+    def __run(self) -> None:
+        while True:
+            with self.__cond:
+                while not self.__pending:
+                    self.__cond.wait()
+                key = self.__pending.pop(0)
+                if key in self.__frames:
+                    continue
+                self.__decoding = key
+
+            try:
+                img = self.render(key[0])
+            except Exception as e:
+                print(f"[ERROR]Prefetch of {key[0]} failed: {e}")
+                img = None
+
+            with self.__cond:
+                self.__store(key, img)
+                self.__decoding = None
+                self.__cond.notify_all()
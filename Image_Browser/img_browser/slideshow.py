@@ -0,0 +1,124 @@
+import json
+import os
+import random
+import time
+from typing import List
+
+from listing import directory_cache
+
+settings_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "slideshow.json")
+ORDERS = ["sequential", "shuffle"]
+min_interval = 1
+max_interval = 30
+
+
+def collect_images(folder: str, recursive: bool = False) -> List[str]:
+    """Image paths of folder in name order, subfolders after the folder's own images"""
+    images = []
+    folders = [folder]
+    while folders:
+        entries = directory_cache.list(folders.pop(0))
+        images += [entry[1] for entry in entries if entry[2] == "image"]
+        if recursive:
+            folders = [entry[1] for entry in entries if entry[2] == "dir"] + folders
+    return images
+
+
+class Slideshow:
+    """Playlist and timing of the slideshow.
+
+    Slides are due on a time.monotonic() deadline that moves by exactly one
+    interval per slide, so decoding time doesn't add up into drift. The
+    caller sleeps in input.check(timeout=time_left()) between slides.
+    Interval, order and crossfade are remembered on the card.
+    """
+
+    def __init__(self, path: str = settings_path):
+        self.path = path
+        self.interval = 3
+        self.order = "sequential"
+        self.crossfade = False
+        self.paths: List[str] = []
+        self.ordered: List[str] = []
+        self.position = 0
+        self.deadline = 0.0
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.interval = min(max(int(data.get("interval", self.interval)), min_interval), max_interval)
+            if data.get("order") in ORDERS:
+                self.order = data["order"]
+            self.crossfade = bool(data.get("crossfade", self.crossfade))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"interval": self.interval, "order": self.order, "crossfade": self.crossfade}, f)
+        except OSError as e:
+            print(f"[ERROR]Cannot save slideshow settings: {e}")
+
+    def start(self, paths: List[str], first: str) -> None:
+        self.paths = list(paths)
+        self.ordered = list(paths)
+        self.position = self.paths.index(first) if first in self.paths else 0
+        if self.order == "shuffle":
+            self.shuffle()
+        self.schedule()
+
+    def shuffle(self) -> None:
+        """Random order starting from the current slide"""
+        current = self.current()
+        random.shuffle(self.paths)
+        self.paths.remove(current)
+        self.paths.insert(0, current)
+        self.position = 0
+
+    def set_order(self, order: str) -> None:
+        self.order = order
+        if order == "shuffle":
+            self.shuffle()
+        else:
+            current = self.current()
+            self.paths = list(self.ordered)
+            self.position = self.paths.index(current)
+        self.save()
+
+    def set_interval(self, interval: int) -> None:
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.schedule()
+        self.save()
+
+    def current(self) -> str:
+        return self.paths[self.position]
+
+    def step(self, delta: int = 1) -> str:
+        self.position = (self.position + delta) % len(self.paths)
+        return self.current()
+
+    def schedule(self) -> None:
+        self.deadline = time.monotonic() + self.interval
+
+    def time_left(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def due(self) -> bool:
+        """Whether the next slide should be shown now; moves the deadline on if so"""
+        now = time.monotonic()
+        if now < self.deadline:
+            return False
+        self.deadline += self.interval
+        if self.deadline <= now:
+            # Fell a whole interval behind (slow decode), don't show slides back to back
+            self.deadline = now + self.interval
+        return True
+
+    def upcoming(self, count: int) -> List[str]:
+        if len(self.paths) < 2:
+            return []
+        return [self.paths[(self.position + step) % len(self.paths)] for step in range(1, count + 1)]
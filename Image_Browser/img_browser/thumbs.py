@@ -0,0 +1,205 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Set, Tuple
+
+from PIL import Image
+
+from decoder import open_scaled
+
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "thumbs")
+
+
+class ThumbnailCache:
+    """Two-level cache of pre-scaled previews.
+
+    Decoded tiles stay in an in-memory LRU, and every generated thumbnail is
+    also written to an on-card directory, so a file is only decoded at full
+    size once. Entries are keyed by (path, mtime, size, target box): editing
+    or replacing a file, or asking for another box, produces a new entry.
+    """
+
+    def __init__(self, directory: str, max_items: int = 96, max_disk_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.__memory: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def make_key(path: str, mtime: float, size: int, box: Tuple[int, int]) -> str:
+        raw = f"{path}|{int(mtime)}|{size}|{box[0]}x{box[1]}"
+        return hashlib.sha1(raw.encode("utf-8", "surrogateescape")).hexdigest()
+
+    def disk_path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def get_cached(self, key: str) -> Optional[Image.Image]:
+        with self.__lock:
+            img = self.__memory.get(key)
+            if img is not None:
+                self.__memory.move_to_end(key)
+            return img
+
+    def remember(self, key: str, img: Image.Image) -> None:
+        with self.__lock:
+            self.__memory[key] = img
+            self.__memory.move_to_end(key)
+            while len(self.__memory) > self.max_items:
+                self.__memory.popitem(last=False)
+
+    def get(self, path: str, box: Tuple[int, int], mtime: Optional[float] = None, size: Optional[int] = None) -> Optional[Image.Image]:
+        """Thumbnail of path fitting box, None if the file can't be decoded"""
+        if mtime is None or size is None:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                print(f"[ERROR]Cannot stat {path}: {e}")
+                return None
+            mtime, size = stat.st_mtime, stat.st_size
+        key = self.make_key(path, mtime, size, box)
+
+        img = self.get_cached(key)
+        if img is not None:
+            return img
+
+        for ext in ("jpg", "png"):
+            thumb_path = self.disk_path(key, ext)
+            if os.path.exists(thumb_path):
+                try:
+                    img = Image.open(thumb_path)
+                    img.load()
+                    self.remember(key, img)
+                    return img
+                except OSError as e:
+                    print(f"[ERROR]Discarding corrupt thumbnail {thumb_path}: {e}")
+                    os.remove(thumb_path)
+
+        img = self.generate(path, box)
+        if img is None:
+            return None
+        self.remember(key, img)
+        self.save(key, img)
+        return img
+
+    @staticmethod
+    def generate(path: str, box: Tuple[int, int]) -> Optional[Image.Image]:
+        try:
+            img = open_scaled(path, box)
+            img.thumbnail(box)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info or "A" in img.getbands() else "RGB")
+            return img
+        except Exception as e:
+            print(f"[ERROR]Cannot create thumbnail for {path}: {e}")
+            return None
+
+    def save(self, key: str, img: Image.Image) -> None:
+        # Opaque previews are stored as JPEG, which is smaller and faster to read back
+        ext = "png" if img.mode == "RGBA" else "jpg"
+        thumb_path = self.disk_path(key, ext)
+        try:
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            tmp_path = f"{thumb_path}.tmp"
+            if ext == "jpg":
+                img.save(tmp_path, format="JPEG", quality=85)
+            else:
+                img.save(tmp_path, format="PNG")
+            os.replace(tmp_path, thumb_path)
+        except OSError as e:
+            print(f"[ERROR]Cannot write thumbnail {thumb_path}: {e}")
+
+    def prune(self) -> None:
+        """Drop the oldest thumbnails once the directory grows past max_disk_bytes"""
+        files = []
+        total = 0
+        try:
+            for sub in os.scandir(self.directory):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+        if total <= self.max_disk_bytes:
+            return
+        files.sort()
+        for _, size, path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_disk_bytes * 3 // 4:
+                break
+        print(f"[INFO]Pruned thumbnail cache to {total // 1024} KB")
+
+
+# (path, box, mtime, size) as passed to ThumbnailCache.get
+Request = Tuple[str, Tuple[int, int], Optional[float], Optional[int]]
+
+
+class ThumbnailLoader:
+    """Fills a ThumbnailCache from a small pool of worker threads.
+
+    The grid asks for the visible page first and the next pages after it;
+    every request() replaces the queue, so scrolling away drops work that is
+    no longer wanted. ready is set whenever a thumbnail lands in the cache.
+    """
+
+    def __init__(self, cache: ThumbnailCache, workers: int = 2):
+        self.cache = cache
+        self.ready = threading.Event()
+        self.__queue: List[Request] = []
+        self.__busy = 0
+        self.__failed: Set[str] = set()
+        self.__cond = threading.Condition()
+        for _ in range(workers):
+            threading.Thread(target=self.__run, daemon=True).start()
+
+    def key(self, item: Request) -> str:
+        path, box, mtime, size = item
+        return self.cache.make_key(path, mtime, size, box)
+
+    def peek(self, path: str, box: Tuple[int, int], mtime: float, size: int) -> Optional[Image.Image]:
+        """Thumbnail if it is already in memory, never touches the card"""
+        return self.cache.get_cached(self.key((path, box, mtime, size)))
+
+    def request(self, items: List[Request]) -> None:
+        with self.__cond:
+            self.__queue = [
+                item for item in items
+                if self.key(item) not in self.__failed and self.peek(*item) is None
+            ]
+            self.__cond.notify_all()
+
+    def pending(self) -> bool:
+        """Whether thumbnails are still queued or being generated"""
+        with self.__cond:
+            return bool(self.__queue) or self.__busy > 0
+
+    def __run(self) -> None:
+        while True:
+            with self.__cond:
+                while not self.__queue:
+                    self.__cond.wait()
+                item = self.__queue.pop(0)
+                self.__busy += 1
+            try:
+                img = self.cache.get(*item)
+            except Exception as e:
+                print(f"[ERROR]Thumbnail of {item[0]} failed: {e}")
+                img = None
+            with self.__cond:
+                self.__busy -= 1
+                if img is None:
+                    # Don't queue a broken file again on every repaint
+                    self.__failed.add(self.key(item))
+            self.ready.set()
+
+
+thumbnail_cache = ThumbnailCache(cache_dir)
+thumbnail_loader = ThumbnailLoader(thumbnail_cache)
@@ -0,0 +1,83 @@
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from decoder import open_scaled
+from prefetch import available_memory
+
+tile_size = 256
+# Full-resolution pixels kept for zooming, the whole pyramid is about 4/3 of it
+zoom_pixels = min(max(available_memory() // 16, 4_000_000), 16_000_000)
+
+
+class TilePyramid:
+    """An image cut into tiles at power-of-two scales, for zooming and panning.
+
+    The file is decoded once; each level is half the size of the one before,
+    down to the first level that fits on screen. Only tiles are kept, so a
+    view is composited from the few tiles it overlaps without any resizing.
+    Level 0 is the full resolution, capped at zoom_pixels.
+    """
+
+    def __init__(self, path: str, screen: Tuple[int, int], pixel_limit: Optional[int] = None):
+        self.path = path
+        pixel_limit = pixel_limit or zoom_pixels
+        with Image.open(path) as header:
+            width, height = header.size
+        scale = min(1.0, (pixel_limit / (width * height)) ** 0.5)
+        img = open_scaled(path, (int(width * scale), int(height * scale)))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or "A" in img.getbands() else "RGB")
+        while img.width * img.height > pixel_limit:
+            img = img.reduce(2)
+
+        # (width, height, tiles by (column, row)) per level
+        self.levels: List[Tuple[int, int, Dict[Tuple[int, int], Image.Image]]] = []
+        while True:
+            self.levels.append((img.width, img.height, self.cut(img)))
+            if img.width <= screen[0] and img.height <= screen[1]:
+                break
+            img = img.reduce(2)
+        print(f"[INFO]Built {len(self.levels)} zoom levels for {path}")
+
+    @staticmethod
+    def cut(img: Image.Image) -> Dict[Tuple[int, int], Image.Image]:
+        tiles = {}
+        for row in range(0, img.height, tile_size):
+            for column in range(0, img.width, tile_size):
+                box = (column, row, min(column + tile_size, img.width), min(row + tile_size, img.height))
+                tiles[(column // tile_size, row // tile_size)] = img.crop(box)
+        return tiles
+
+    def zoom_levels(self, screen: Tuple[int, int]) -> List[int]:
+        """Levels larger than the screen, least zoomed first"""
+        return [
+            level for level in reversed(range(len(self.levels)))
+            if self.levels[level][0] > screen[0] or self.levels[level][1] > screen[1]
+        ]
+
+    def clamp(self, level: int, center: Tuple[float, float], screen: Tuple[int, int]) -> Tuple[float, float]:
+        """Keep the view inside the image, centred on axes where it is smaller than the screen"""
+        width, height = self.levels[level][:2]
+        clamped = []
+        for value, size, view in ((center[0], width, screen[0]), (center[1], height, screen[1])):
+            if size <= view:
+                clamped.append(0.5)
+            else:
+                half = view / 2 / size
+                clamped.append(min(max(value, half), 1 - half))
+        return clamped[0], clamped[1]
+
+    def visible(self, level: int, center: Tuple[float, float], screen: Tuple[int, int]) -> List[Tuple[Image.Image, Tuple[int, int]]]:
+        """Tiles overlapping the view around center (0-1 on each axis) and where to paste them"""
+        width, height, tiles = self.levels[level]
+        left = int(center[0] * width - screen[0] / 2)
+        top = int(center[1] * height - screen[1] / 2)
+        first_column, first_row = max(0, left // tile_size), max(0, top // tile_size)
+        last_column = min((width - 1) // tile_size, (left + screen[0]) // tile_size)
+        last_row = min((height - 1) // tile_size, (top + screen[1]) // tile_size)
+        return [
+            (tiles[(column, row)], (column * tile_size - left, row * tile_size - top))
+            for row in range(first_row, last_row + 1)
+            for column in range(first_column, last_column + 1)
+        ]
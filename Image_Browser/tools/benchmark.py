@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Compare full decode + resize against the reduced-scale decoder.
+
+    python3 tools/benchmark.py
+    python3 tools/benchmark.py --size 8000x6000 --box 720x720
+
+Every case runs in its own process, so the peak RSS reported is the one of
+that decode alone.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "img_browser"))
+
+from PIL import Image  # noqa: E402
+from decoder import open_scaled  # noqa: E402
+
+FORMATS = [("JPEG", "jpg"), ("PNG", "png"), ("BMP", "bmp")]
+
+
+def parse_size(value: str):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def make_sample(path: str, size, fmt: str) -> None:
+    """Gradient plus noise, so PNG and JPEG don't compress it to nothing"""
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 32)
+    img = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    img.save(path, format=fmt)
+
+
+def fit(img: Image.Image, box):
+    zoom = min(box[0] / img.width, box[1] / img.height)
+    return img.resize((int(img.width * zoom), int(img.height * zoom)), Image.LANCZOS)
+
+
+def peak_rss() -> int:
+    """VmHWM of this process; unlike ru_maxrss it isn't inherited across exec"""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def run_case(path: str, method: str, box) -> dict:
+    start = time.perf_counter()
+    if method == "full":
+        img = Image.open(path)
+        img.load()
+    else:
+        img = open_scaled(path, box)
+    img = fit(img, box)
+    elapsed = time.perf_counter() - start
+    return {"ms": elapsed * 1000, "peak": peak_rss(), "size": img.size}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="6000x4000", help="source image size, WxH")
+    parser.add_argument("--box", default="640x480", help="screen size to fit, WxH")
+    parser.add_argument("--case", nargs=2, metavar=("PATH", "METHOD"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    box = parse_size(args.box)
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], args.case[1], box)))
+        return
+
+    size = parse_size(args.size)
+    print(f"Source {size[0]}x{size[1]}, fitted to {box[0]}x{box[1]}")
+    print(f"{'format':<6} {'method':<8} {'decode ms':>10} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, ext in FORMATS:
+            path = os.path.join(tmp, f"sample.{ext}")
+            make_sample(path, size, fmt)
+            for method in ("full", "scaled"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--box", args.box, "--case", path, method],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.splitlines()[-1])
+                print(f"{fmt:<6} {method:<8} {result['ms']:>10.1f} {result['peak'] / 1024 / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
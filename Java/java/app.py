@@ -11,6 +11,7 @@ import urllib.request
 import zipfile
 import shutil
 from language import Translator
+from progress import ProgressReporter
 from main import hw_info, system_lang
 
 translator = Translator(system_lang)
@@ -244,16 +245,12 @@ def run_game(game_path):
         env
     )
 
-def show_download_progress(block_num, block_size, total_size):
+def show_progress(progress):
     try:
-        downloaded = block_num * block_size
-        if total_size > 0:
-            percent = min(100, downloaded * 100 / total_size)
-        else:
-            percent = 0
+        percent = progress.percent
         
         draw_clear()
-        draw_text((screen_width // 2, screen_height // 2 - 30), f"{translator.translate('Downloading JAVA')}", font=23, anchor="mm")
+        draw_text((screen_width // 2, screen_height // 2 - 30), f"{translator.translate(progress.phase)}", font=23, anchor="mm")
         bar_width = screen_width - 100
         draw_rectangle([50, screen_height // 2, 50 + bar_width, screen_height // 2 + 20], fill=colorGrayL1)
         filled_width = int(bar_width * percent / 100)
@@ -264,6 +261,14 @@ def show_download_progress(block_num, block_size, total_size):
     except Exception as e:
         pass
 
+def extract_zip(zip_path, target_path, on_progress):
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        files = zip_ref.namelist()
+        total_files = len(files)
+        for i, file in enumerate(files):
+            zip_ref.extract(file, target_path)
+            on_progress(i + 1, total_files)
+
 def download_and_extract_java():
     JAVA_ZIP_URL = "https://github.com/kai4man/Anbernic-H700-RG-xx-StockOS-Modification-JAVA/archive/refs/heads/main.zip"
     TEMP_FILE = "/mnt/mmc/java_download.zip"
@@ -282,31 +287,14 @@ def download_and_extract_java():
         if os.path.exists(MAIN_DIR):
             shutil.rmtree(MAIN_DIR)
 
-        draw_clear()
-        draw_text((screen_width // 2, screen_height // 2 - 30), f"{translator.translate('Downloading JAVA')}", font=23, anchor="mm")
-        draw_paint()
-        time.sleep(0.05)
+        # Download and extraction run on a worker thread, the screen is redrawn at most 10 times a second
+        progress = ProgressReporter(show_progress)
         socket.setdefaulttimeout(30)
-        urllib.request.urlretrieve(JAVA_ZIP_URL, TEMP_FILE, show_download_progress)
+        progress.set_phase('Downloading JAVA')
+        progress.run(urllib.request.urlretrieve, JAVA_ZIP_URL, TEMP_FILE, progress.hook)
 
-        draw_clear()
-        draw_text((screen_width // 2, screen_height // 2 - 30), f"{translator.translate('Unpacking JAVA')}", font=23, anchor="mm")
-        draw_paint()
-        with zipfile.ZipFile(TEMP_FILE, 'r') as zip_ref:
-            files = zip_ref.namelist()
-            total_files = len(files)
-            for i, file in enumerate(files):
-                zip_ref.extract(file, EXTRACT_PATH)
-                percent = (i + 1) * 100 / total_files
-                draw_clear()
-                draw_text((screen_width // 2, screen_height // 2 - 30), f"{translator.translate('Unpacking JAVA')}", font=23, anchor="mm")
-                bar_width = screen_width - 100
-                draw_rectangle([50, screen_height // 2, 50 + bar_width, screen_height // 2 + 20], fill=colorGrayL1)
-                filled_width = int(bar_width * percent / 100)
-                if filled_width > 0:
-                    draw_rectangle([50, screen_height // 2, 50 + filled_width, screen_height // 2 + 20], fill=colorBlue)
-                draw_text((screen_width // 2, screen_height // 2 + 30), f"{int(percent)}%", font=19, anchor="mm")
-                draw_paint()
+        progress.set_phase('Unpacking JAVA')
+        progress.run(extract_zip, TEMP_FILE, EXTRACT_PATH, progress.update)
 
         if os.path.exists(EMU_SRC):
             if os.path.exists(EMU_DST):
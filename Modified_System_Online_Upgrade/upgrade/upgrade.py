@@ -29,6 +29,11 @@ from urllib.error import ContentTooShortError, URLError
 # =========================
 from PIL import Image, ImageDraw, ImageFont
 
+# =========================
+# Local Imports
+# =========================
+from progress import ProgressReporter
+
 cur_app_ver = "1.1.2"
 base_ver = "3.8.0"
 
@@ -1304,9 +1309,9 @@ class Updater:
         ui.paint()
         time.sleep(3)
 
-        def progress_hook(block_num: int, block_size: int, total_size: int, num_file=None):
+        def draw_progress(progress: ProgressReporter):
             try:
-                downloaded = block_num * block_size
+                downloaded, total_size, num_file = progress.done, progress.total, progress.label
                 if total_size > 0:
                     percent = min(100, downloaded * 100 // total_size)
                     label_top = t.t("Downloading App Files...") + num_file
@@ -1331,7 +1336,8 @@ class Updater:
         LOGGER.info("Starting upgrade app process")
         self.draw_message_center(t.t("Downloading"), t.t("Fetching verification data..."), "㊙", "info")
 
-        download_result = self._download_file(update_url, self.cfg.tmp_app_update, progress_hook, '(1/1)')
+        progress = ProgressReporter(draw_progress)
+        download_result = progress.run(self._download_file, update_url, self.cfg.tmp_app_update, progress.hook, '(1/1)')
 
         if download_result == "cancelled":
             LOGGER.info("App update cancelled by user")
@@ -1376,9 +1382,9 @@ class Updater:
         ui = self.ui
         t = self.t
 
-        def progress_hook(block_num: int, block_size: int, total_size: int, num_file=None):
+        def draw_progress(progress: ProgressReporter):
             try:
-                downloaded = block_num * block_size
+                downloaded, total_size, num_file = progress.done, progress.total, progress.label
                 if total_size > 0:
                     percent = min(100, downloaded * 100 // total_size)
                     label_top = t.t("Downloading Update Files...") + num_file
@@ -1415,12 +1421,15 @@ class Updater:
         if not os.path.exists(self.cfg.target_path):
             os.makedirs(self.cfg.target_path, exist_ok=True)
 
+        progress = ProgressReporter(draw_progress)
         file_num = 1
         for item in update_file_list:
             down_url = self.cfg.server_url + item['filename']
             target_file = os.path.join(self.cfg.target_path, item['filename'])
-            download_result = self._download_file(down_url, target_file, progress_hook,
-                                                  str(f'({file_num}/{len(update_file_list)})'))
+            # Each file starts from zero, not from where the previous one ended
+            progress.set_phase(item['filename'])
+            download_result = progress.run(self._download_file, down_url, target_file, progress.hook,
+                                           str(f'({file_num}/{len(update_file_list)})'))
 
             if download_result == "cancelled":
                 LOGGER.info("System update cancelled by user")
@@ -1505,9 +1514,9 @@ class Updater:
         ui = self.ui
         t = self.t
 
-        def progress_hook(block_num: int, block_size: int, total_size: int, num_file=None):
+        def draw_progress(progress: ProgressReporter):
             try:
-                downloaded = block_num * block_size
+                downloaded, total_size, num_file = progress.done, progress.total, progress.label
                 if total_size > 0:
                     percent = min(100, downloaded * 100 // total_size)
                     label_top = t.t("Downloading Update Files...") + num_file
@@ -1532,7 +1541,8 @@ class Updater:
         LOGGER.info("Starting OS append update process")
         self.draw_message_center(t.t("Downloading"), t.t("Fetching verification data..."), "㊙", "info")
 
-        download_result = self._download_file(update_url, self.cfg.tmp_update, progress_hook, '(1/1)')
+        progress = ProgressReporter(draw_progress)
+        download_result = progress.run(self._download_file, update_url, self.cfg.tmp_update, progress.hook, '(1/1)')
 
         if download_result == "cancelled":
             LOGGER.info("Append update cancelled by user")
@@ -1591,31 +1601,8 @@ class Updater:
             LOGGER.error("Update file not found: %s", dep_path)
             return 1
         try:
-            with zipfile.ZipFile(dep_path, "r") as zip_ref:
-                namelist = zip_ref.namelist()
-                total_files = len(namelist)
-                LOGGER.info("Unpacking %s files from %s", total_files, dep_path)
-                for i, file in enumerate(namelist):
-                    zip_ref.extract(file, target_path)
-                    percent = (i + 1) * 100 / max(1, total_files)
-
-                    ui = self.ui
-                    ui.clear()
-                    ui.info_header(self.t.t("System Update"), self.t.t("Extracting files..."))
-
-                    file_name = os.path.basename(file)
-                    if len(file_name) > 30:
-                        file_name = file_name[:27] + "..."
-
-                    ui.text((ui.x_size // 2, ui.y_size // 2 - 20), f"{self.t.t('File')}: {file_name}", font=18,
-                            anchor="mm")
-
-                    progress_text = f"{i + 1} / {total_files} {self.t.t('files')}"
-                    ui.text((ui.x_size // 2, ui.y_size // 2 + 40), progress_text,
-                            font=16, anchor="mm", color=ui.cfg.COLOR_TEXT_SECONDARY)
-
-                    ui.progress_bar(ui.y_size // 2 + 10, percent)
-                    ui.paint()
+            progress = ProgressReporter(self._draw_unpack_progress)
+            progress.run(self._extract_all, dep_path, target_path, progress.update)
             LOGGER.info("Unpacking completed successfully")
             return 0
         except zipfile.BadZipFile:
@@ -1625,6 +1612,35 @@ class Updater:
             LOGGER.error("Error unpacking zip file: %s", e)
             return 1
 
+    @staticmethod
+    def _extract_all(dep_path: str, target_path: str, on_progress) -> None:
+        with zipfile.ZipFile(dep_path, "r") as zip_ref:
+            namelist = zip_ref.namelist()
+            total_files = len(namelist)
+            LOGGER.info("Unpacking %s files from %s", total_files, dep_path)
+            for i, file in enumerate(namelist):
+                zip_ref.extract(file, target_path)
+                on_progress(i + 1, total_files, file)
+
+    def _draw_unpack_progress(self, progress: ProgressReporter) -> None:
+        ui = self.ui
+        ui.clear()
+        ui.info_header(self.t.t("System Update"), self.t.t("Extracting files..."))
+
+        file_name = os.path.basename(progress.label)
+        if len(file_name) > 30:
+            file_name = file_name[:27] + "..."
+
+        ui.text((ui.x_size // 2, ui.y_size // 2 - 20), f"{self.t.t('File')}: {file_name}", font=18,
+                anchor="mm")
+
+        progress_text = f"{progress.done} / {progress.total} {self.t.t('files')}"
+        ui.text((ui.x_size // 2, ui.y_size // 2 + 40), progress_text,
+                font=16, anchor="mm", color=ui.cfg.COLOR_TEXT_SECONDARY)
+
+        ui.progress_bar(ui.y_size // 2 + 10, progress.percent)
+        ui.paint()
+
 
 # =========================
 # Main Application
@@ -1,5 +1,5 @@
 import os
-from pathlib import Path
+from storage import storage_state
 
 
 class Anbernic:
@@ -27,18 +27,18 @@ class Anbernic:
             self.__current_sd = sd
     
     def get_sd_storage(self):
-        if self.__current_sd == 2 and not any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 2 and not storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 1
         return self.__current_sd
     
     def switch_sd_storage(self):
-        if self.__current_sd == 1 and any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 1 and storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 2
         else:
             self.__current_sd = 1
     
     def get_sd_storage_path(self):
-        if self.__current_sd == 1 or not any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 1 or not storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 1
             return self.get_sd1_storage_path()
         else:
@@ -12,10 +12,17 @@ import json
 import shutil
 import subprocess
 import tempfile
-import zipfile
 import logging
 import glob
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from downloader import DownloadScheduler
+from installer import ZipInstaller, recover_interrupted_install
+from releases import release_cache
+from patcher import patcher, Insert, Replace, Append
+from privileged import PrivilegedBatch
+from runtimes import RuntimeSync, asset_file
+from progress import ProgressReporter
 
 program = os.path.dirname(os.path.abspath(__file__))
 
@@ -24,8 +31,11 @@ GITHUB_DOWNLOAD_URL = "https://github.com/PortsMaster/PortMaster-GUI/releases/la
 RUNTIMES_API_URL = "https://api.github.com/repos/kai4man/Anbernic-H700-RG-xx-StockOS-Modification-PM-runtimes/releases/latest"
 
 LEGACY_PORTMASTER_DIR = "/roms/ports/PortMaster"
+RUNTIME_DOWNLOAD_WORKERS = 3
+PREFETCH_NICE = 10
 
-TEMP_FILE = "/tmp/PortMaster.zip"
+DOWNLOAD_CACHE_DIR = os.path.join(program, "cache")
+PORTMASTER_ZIP = os.path.join(DOWNLOAD_CACHE_DIR, "PortMaster.zip")
 TEMP_DIR = "/tmp/PortMaster_Update"
 PYLIBS_DIR = os.path.join(LEGACY_PORTMASTER_DIR, "pylibs/harbourmaster")
 CONFIG_FILE = os.path.join(PYLIBS_DIR, "config.py")
@@ -33,6 +43,7 @@ HARBOUR_FILE = os.path.join(PYLIBS_DIR, "harbour.py")
 PUGSCENE_FILE = os.path.join(LEGACY_PORTMASTER_DIR, "pylibs/pugscene.py")
 
 translator = Translator(system_lang)
+runtime_sync = RuntimeSync(os.path.join(LEGACY_PORTMASTER_DIR, "libs"))
 gr = UserInterface()
 selected_position = 0
 roms_selected_position = 0
@@ -42,6 +53,8 @@ fix_flg_k4m="make by KAI4MAN"
 fix_flg_grh="make by G.R.H"
 port_master_github_version = f"#{fix_flg_k4m}"
 current_version = ""
+port_master_release_info = None
+runtimes_release_info = None
 
 log_dir = os.path.join(program, "logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -64,17 +77,69 @@ button_y = y_size - 30
 ratio = y_size / x_size
 
 def start() -> None:
+    started = time.monotonic()
 
-    if not is_connected():
+    # A swap cut off by a power loss may have left PortMaster.sh missing
+    try:
+        recover_interrupted_install(LEGACY_PORTMASTER_DIR)
+    except OSError as e:
+        logger.error(f"Ошибка восстановления PortMaster: {e}")
+
+    # Network checks run side by side
+    pool = ThreadPoolExecutor(max_workers=4)
+    connected = pool.submit(timed, "Проверка сети", is_connected)
+    port_master_ok = pool.submit(timed, "Проверка версии PortMaster", check_port_master_version)
+    runtimes_ok = pool.submit(timed, "Проверка рантаймов", check_runtimes_version)
+
+    if not connected.result():
+        # Don't hold the exit for release checks nobody will read
+        pool.shutdown(wait=False, cancel_futures=True)
         exit_program(f"{translator.translate('No internet connection')}", 3)
 
-    if not check_port_master_version():
+    # The local fixes stay behind the network gate as before, next to the release checks
+    local_updates = pool.submit(timed, "Локальные исправления", apply_local_updates)
+
+    port_master_ok = port_master_ok.result()
+    runtimes_ok = runtimes_ok.result()
+    logger.info(f"Проверки завершены за {time.monotonic() - started:.2f} с")
+
+    if not port_master_ok:
+        # Start on the download while the user reads the prompt
+        prefetch = start_port_master_download(nice=PREFETCH_NICE)
         if load_screen_show_update_prompt():
-            load_screen_update_port_master()
+            # The update replaces the files the fixes are written into
+            local_updates.result()
+            timed("Обновление PortMaster", load_screen_update_port_master, prefetch)
+            local_updates = pool.submit(timed, "Локальные исправления", apply_local_updates)
+        else:
+            # The partial file stays in the cache and is continued next time
+            prefetch.stop()
+
+    if runtime_sync.verifying():
+        # Only runtimes changed on the card since their last check are hashed
+        gr.draw_clear()
+        gr.draw_text((x_size / 2, y_size / 2), translator.translate('Checking runtimes...'), font=23, anchor="mm")
+        gr.draw_paint()
+        timed("Проверка целостности рантаймов", runtime_sync.wait)
+
+    if not runtimes_ok or runtime_sync.damaged:
+        # Corrupt runtimes are fetched again in this session, not on the next launch
+        timed("Рантаймы", load_creen_runtimes)
 
-    if not check_runtimes_version():
-        load_creen_runtimes()
+    local_updates.result()
+    pool.shutdown()
+    logger.info(f"Подготовка заняла {time.monotonic() - started:.2f} с")
+
+    clean_exit(*sys.argv[1:])
 
+def timed(phase: str, func, *args):
+    started = time.monotonic()
+    try:
+        return func(*args)
+    finally:
+        logger.info(f"{phase}: {time.monotonic() - started:.2f} с")
+
+def apply_local_updates() -> None:
     if not check_and_update_pugscene():   
         logger.warning("Предупреждение: проблемы с конфигурацией pugscene.py")
 
@@ -90,8 +155,6 @@ def start() -> None:
     if not set_portmaster_language():
         logger.error("Ошибка установки языка портмастера")
 
-    clean_exit(*sys.argv[1:])
-
 def is_connected():
     test_servers = [
         ("8.8.8.8", 53),  # google
@@ -99,14 +162,24 @@ def is_connected():
         ("223.5.5.5", 53),       # ali DNS
         ("220.181.38.148", 80)   # baidu
     ]
-    for host, port in test_servers:
+
+    def probe(server):
         try:
-            sock = socket.create_connection((host, port), timeout=3)
+            sock = socket.create_connection(server, timeout=3)
             sock.close()
             return True
         except (socket.timeout, socket.error):
-            continue
-    return False
+            return False
+
+    pool = ThreadPoolExecutor(max_workers=len(test_servers))
+    try:
+        # The first server to answer is enough
+        for result in as_completed([pool.submit(probe, server) for server in test_servers]):
+            if result.result():
+                return True
+        return False
+    finally:
+        pool.shutdown(wait=False)
     
 def exit_program(error_message: str = "", time_sleep: int = 0) -> None:
     if error_message:
@@ -124,15 +197,6 @@ def check_and_update_pugscene():
         return True
 
     try:
-        with open(PUGSCENE_FILE, 'r') as f:
-            content = f.read()
-        
-        if f'#{fix_flg_k4m}' in content:
-            return True
-            
-        lines = content.splitlines()
-        lines.insert(0, f'#{fix_flg_k4m}')
-        
         stockos_block = '''
         elif Path("/roms/ports").is_dir():
             if '/mnt/sdcard' in subprocess.getoutput(['df']):
@@ -143,17 +207,6 @@ def check_and_update_pugscene():
                     _("Ports Location: ") +  (SYSTEM_SD_TOGGLE.is_file() and _("SD 1") or _("SD 2")),
                     description=_("Location where ports should be installed to."))
 '''
-        search_string = "self.tags['option_list'].add_option(None, _(\"System\"))"
-        found = False
-        for line in lines:
-            if search_string in line:
-                lines.insert(lines.index(line), stockos_block)
-                found = True
-                break
-        
-        if not found:
-            return False
-
         toggle_block = '''
             if selected_option == 'system-port-mode-toggle':
                 if '/mnt/sdcard' in subprocess.getoutput(['df']):
@@ -183,24 +236,12 @@ def check_and_update_pugscene():
 
                         return True
 '''
-        search_string = "if selected_option == 'runtime-manager':"
-        found = False
-        for line in lines:
-            if search_string in line:
-                lines.insert(lines.index(line), toggle_block)
-                found = True
-                break
-        
-        if not found:
-            return False
+        return patcher.apply(PUGSCENE_FILE, f'#{fix_flg_k4m}', [
+            Insert(f'#{fix_flg_k4m}'),
+            Insert(stockos_block, anchor="self.tags['option_list'].add_option(None, _(\"System\"))"),
+            Insert(toggle_block, anchor="if selected_option == 'runtime-manager':"),
+        ])
 
-        os.remove(PUGSCENE_FILE)
-            
-        with open(PUGSCENE_FILE, "w") as f:
-            f.write("\n".join(lines))
-            
-        return True
-            
     except Exception as e:
         logger.error(f"Ошибка при обновлении pugscene.py: {e}")
         return False
@@ -211,15 +252,6 @@ def check_and_update_config():
         return True
 
     try:
-        with open(CONFIG_FILE, "r") as f:
-            content = f.read()
-        
-        if f'#{fix_flg_k4m}' in content:
-            return True
-            
-        lines = content.splitlines()
-        lines.insert(0, f'#{fix_flg_k4m}')
-        
         stockos_block = '''
 elif Path("/roms/ports/PortMaster/").is_dir():
     ## stockOS
@@ -233,21 +265,11 @@ elif Path("/roms/ports/PortMaster/").is_dir():
         HM_DEFAULT_PORTS_DIR   = Path("/mnt/sdcard/roms/ports")
         HM_DEFAULT_SCRIPTS_DIR = Path("/mnt/sdcard/roms/ports")
 '''
-        search_string = 'elif Path("/opt/system/Tools").is_dir():'
-        found = False
-        for line in lines:
-            if search_string in line:
-                lines.insert(lines.index(line), stockos_block)
-                found = True
-                break
-        
-        if not found:
-            return False
-            
-        with open(CONFIG_FILE, "w") as f:
-            f.write("\n".join(lines))
-        return True
-            
+        return patcher.apply(CONFIG_FILE, f'#{fix_flg_k4m}', [
+            Insert(f'#{fix_flg_k4m}'),
+            Insert(stockos_block, anchor='elif Path("/opt/system/Tools").is_dir():'),
+        ])
+
     except Exception as e:
         logger.error(f"Ошибка обновления конфигурации: {str(e)}")
         return False
@@ -257,34 +279,7 @@ def check_and_update_harbour():
         return True
 
     try:
-        with open(HARBOUR_FILE, "r") as f:
-            content = f.read()
-        
-        changes_made = False
-        lines = content.splitlines()
-        
-        if f'#{fix_flg_grh}' not in content:
-            lines.insert(0, f'#{fix_flg_grh}')
-            changes_made = True
-            
-            if 'self.install_image(port_info)' not in content:
-                for i, line in enumerate(lines):
-                    if 'self.callback.message_box(_("Port {download_name!r} installed successfully.").format(download_name=port_nice_name))' in line:
-                        lines.insert(i + 2, '        self.install_image(port_info)')
-                        changes_made = True
-                        break
-            
-            if 'self.uninstall_image(port_info)' not in content:
-                for i, line in enumerate(lines):
-                    if 'self.callback.message_box(_("Successfully uninstalled {port_name}").format(port_name=port_info_name))' in line:
-                        leading_spaces = line[:len(line) - len(line.lstrip())]
-                        new_line = leading_spaces + 'self.uninstall_image(port_info)'
-                        lines.insert(i + 1, new_line)
-                        changes_made = True
-                        break
-            
-            if 'def install_image(self, port_info_list):' not in content:
-                install_image_code = '''
+        install_image_code = '''
     def install_image(self, port_info_list):
         logger.info(f"install_image-->port_info_list: {port_info_list}")
         port_dir = f"{self.ports_dir}"
@@ -315,14 +310,8 @@ def check_and_update_harbour():
         logger.info(f"source_image_path: {source_image_path}, target_image_path: {target_image_path}")
         shutil.copy2(source_image_path, target_image_path)
 '''
-                for i, line in enumerate(lines):
-                    if '__all__ = (' in line:
-                        lines.insert(i - 1, install_image_code)
-                        changes_made = True
-                        break
-            
-            if 'def uninstall_image(self, port_info):' not in content:
-                uninstall_image_code = '''
+
+        uninstall_image_code = '''
     def uninstall_image(self, port_info):
         logger.info(f"uninstall_image-->port_info: {port_info}")
         port_image_dir = self.ports_dir / "Imgs"
@@ -345,27 +334,20 @@ def check_and_update_harbour():
         if target_image_path.exists():
             target_image_path.unlink()
 '''
-                for i, line in enumerate(lines):
-                    if '__all__ = (' in line:
-                        lines.insert(i - 1, uninstall_image_code)
-                        changes_made = True
-                        break
-            
-#            old_text = "https://github.com/PortsMaster/PortMaster-Info/raw/main/"
-#            new_text = "https://github.com/PortsMaster/PortMaster-Info/blob/main/"
-            
-#            if old_text in content:
-#                content = content.replace(old_text, new_text)
-#                changes_made = True
-            
-            if changes_made:
-                with open(HARBOUR_FILE, "w") as f:
-                    f.write("\n".join(lines))
-            
-            return True
-        else:
-            return True
-            
+        return patcher.apply(HARBOUR_FILE, f'#{fix_flg_grh}', [
+            Insert(f'#{fix_flg_grh}'),
+            Insert('        self.install_image(port_info)', offset=2, required=False,
+                   anchor='self.callback.message_box(_("Port {download_name!r} installed successfully.").format(download_name=port_nice_name))',
+                   unless='self.install_image(port_info)'),
+            Insert('self.uninstall_image(port_info)', offset=1, indent=True, required=False,
+                   anchor='self.callback.message_box(_("Successfully uninstalled {port_name}").format(port_name=port_info_name))',
+                   unless='self.uninstall_image(port_info)'),
+            Insert(install_image_code, anchor='__all__ = (', offset=-1, required=False,
+                   unless='def install_image(self, port_info_list):'),
+            Insert(uninstall_image_code, anchor='__all__ = (', offset=-1, required=False,
+                   unless='def uninstall_image(self, port_info):'),
+        ])
+
     except Exception as e:
         logger.error(f"Ошибка обновления конфигурации: {str(e)}")
         return False
@@ -447,27 +429,30 @@ def clean_exit(*args):
     
     logger.info("Очистка временных файлов...")
     shutil.rmtree(TEMP_DIR, ignore_errors=True)
-    if os.path.exists(TEMP_FILE):
-        os.remove(TEMP_FILE)
 
     try:
         logger.info("Настройка библиотеки...")
-        for path in glob.glob('/usr/lib/aarch64-linux-gnu/libEGL.so*'):
-            subprocess.run(["sudo", "rm", "-f", path], check=True)
-        for path in glob.glob('/usr/lib/aarch64-linux-gnu/libGLES*'):
-            subprocess.run(["sudo", "rm", "-f", path], check=True)
-        subprocess.run(["sudo", "ln", "-sf", "/usr/lib/libmali.so", "/usr/lib/aarch64-linux-gnu/libEGL.so.1"], check=True)
-        subprocess.run(["sudo", "ln", "-sf", "/usr/lib/libmali.so", "/usr/lib/aarch64-linux-gnu/libGLESv2.so.2"], check=True)
-        subprocess.run(["sudo", "cp", "-f", "/lib/arm-linux-gnueabihf/libfreetype.so.6", "/mnt/vendor/lib/libfreetype.so.6.8.0"], check=True)
-        subprocess.run(["sudo", "ln", "-sf", "/usr/lib/aarch64-linux-gnu/libSDL2-2.0.so.0.2800.5", "/usr/lib/libSDL2-2.0.so.0"], check=True)
-        subprocess.run(["sudo", "ln", "-sf", "/mnt/vendor/deep/retro/retroarch", "/usr/bin/retroarch"], check=True)
+        batch = PrivilegedBatch("Настройка библиотек")
+        mali_links = {
+            "/usr/lib/aarch64-linux-gnu/libEGL.so.1",
+            "/usr/lib/aarch64-linux-gnu/libGLESv2.so.2",
+        }
+        for path in glob.glob('/usr/lib/aarch64-linux-gnu/libEGL.so*') + glob.glob('/usr/lib/aarch64-linux-gnu/libGLES*'):
+            if path not in mali_links:
+                batch.remove(path)
+        for path in sorted(mali_links):
+            batch.symlink("/usr/lib/libmali.so", path)
+        batch.copy("/lib/arm-linux-gnueabihf/libfreetype.so.6", "/mnt/vendor/lib/libfreetype.so.6.8.0")
+        batch.symlink("/usr/lib/aarch64-linux-gnu/libSDL2-2.0.so.0.2800.5", "/usr/lib/libSDL2-2.0.so.0")
+        batch.symlink("/mnt/vendor/deep/retro/retroarch", "/usr/bin/retroarch")
+        if batch.commands:
+            # The library cache only needs rebuilding when a library changed
+            batch.add("ldconfig")
+        if batch.run():
+            logger.info("Библиотеки настроены успешно")
         if os.path.exists("/usr/bin/retroarch"):
             os.chmod("/usr/bin/retroarch", 0o755)
-        subprocess.run(["sudo", "ldconfig"], check=True)
-        logger.info("Библиотеки настроены успешно")
         
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Ошибка при настройке библиотек: {str(e)}")
     except Exception as e:
         logger.error(f"Ошибка при настройке библиотек: {str(e)}")
 
@@ -490,11 +475,10 @@ def check_port_master_version() -> bool:
 
     try:
 
-        response = requests.get(GITHUB_API_URL, timeout=10)
-        response.raise_for_status()
-        release_info = response.json()
+        release_info = release_cache.get(GITHUB_API_URL)
 
-        global port_master_github_version, current_version
+        global port_master_github_version, current_version, port_master_release_info
+        port_master_release_info = release_info
         port_master_github_version = release_info.get("tag_name", "")
         logger.info(f"Получена версия с GitHub: {port_master_github_version}")
         
@@ -520,6 +504,13 @@ def check_port_master_version() -> bool:
         logger.error(f"Ошибка проверки версии: {str(e)}")
         return True
     
+def port_master_asset() -> tuple:
+    """URL, destination, size and digest of PortMaster.zip in the latest release"""
+    for asset in (port_master_release_info or {}).get("assets", []):
+        if asset.get("name") == "PortMaster.zip" and asset.get("browser_download_url"):
+            return asset["browser_download_url"], PORTMASTER_ZIP, asset.get("size", 0), asset.get("digest") or ""
+    return GITHUB_DOWNLOAD_URL, PORTMASTER_ZIP, 0, ""
+
 def load_screen_show_update_prompt() -> bool:
     global selected_position, selected_system, skip_input_check, current_version
 
@@ -545,16 +536,21 @@ def load_screen_show_update_prompt() -> bool:
     input.reset_input()
     return False    
 
-def load_screen_update_port_master() -> None:
-    global selected_position, selected_system, skip_input_check, port_master_github_version
+def start_port_master_download(nice: int = 0) -> DownloadScheduler:
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+    scheduler = DownloadScheduler(workers=1, nice=nice)
+    scheduler.add(*port_master_asset())
+    scheduler.start()
+    return scheduler
 
-    shutil.rmtree(TEMP_DIR, ignore_errors=True)
-    os.makedirs(TEMP_DIR, exist_ok=True)
+def load_screen_update_port_master(prefetch: DownloadScheduler = None) -> None:
+    global selected_position, selected_system, skip_input_check, port_master_github_version
 
-    def show_download_progress(block_num, block_size, total_size):
+    def show_download_progress(scheduler):
 
         try:
-            downloaded = block_num * block_size
+            downloaded = scheduler.done_bytes
+            total_size = scheduler.total_bytes
             if total_size > 0:
                 percent = min(100, downloaded * 100 / total_size)
                 mb_size = total_size / 1048576
@@ -574,106 +570,62 @@ def load_screen_update_port_master() -> None:
         except Exception as e:
             logger.error(f"Ошибка отображения прогресса: {str(e)}")
 
+    def show_unpack_progress(progress):
+        percent = progress.percent
+        gr.draw_clear()
+        gr.draw_text((x_size / 2, y_size / 2 - 60), translator.translate('Unpacking the PortMaster...'), font=23, anchor="mm")
+        gr.draw_text((x_size / 2, y_size / 2 - 30), f"{translator.translate('File')}: {os.path.basename(progress.label)}", font=19, anchor="mm")
+
+        bar_width = x_size - 100
+        gr.draw_rectangle([50, y_size / 2 + 20, 50 + bar_width, y_size / 2 + 40], fill=gr.colorGrayL1)
+
+        filled_width = int(bar_width * percent / 100)
+        if filled_width > 0:
+            gr.draw_rectangle([50, y_size / 2 + 20, 50 + filled_width, y_size / 2 + 40], fill=gr.colorBlue)
+
+        gr.draw_text((x_size / 2, y_size / 2 + 30), f"{int(percent)}%", font=19, anchor="mm")
+        gr.draw_paint()
+
     try:
         gr.draw_clear()
         gr.draw_text((x_size / 2, y_size / 2 - 60), translator.translate('Downloading PortMaster...'), font=23, anchor="mm")
         gr.draw_paint()
 
-        response = requests.get(GITHUB_DOWNLOAD_URL, stream=True, timeout=30)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 512 * 1024  # 512KB blocks
-        downloaded = 0
-        block_num = 0
-
-        with open(TEMP_FILE, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=block_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    block_num += 1
-                    show_download_progress(block_num, block_size, total_size)
+        scheduler = prefetch or start_port_master_download()
+        # The user is waiting on it now
+        scheduler.promote()
+        task = scheduler.tasks[0]
+        if task.state == "done":
+            logger.info("PortMaster.zip уже скачан в фоне")
+        scheduler.wait(show_download_progress)
+        if task.state == "failed" and prefetch:
+            # The background attempt gave up, continue its partial file in the foreground
+            scheduler = start_port_master_download()
+            task = scheduler.tasks[0]
+            scheduler.wait(show_download_progress)
+        if task.state != "done":
+            raise IOError(task.error)
 
         gr.draw_clear()
         gr.draw_text((x_size / 2, y_size / 2 - 60), translator.translate('Unpacking the PortMaster...'), font=23, anchor="mm")
         gr.draw_paint()
-        
-        libs_exists = False
-        if os.path.exists(LEGACY_PORTMASTER_DIR):
-            libs_dir = os.path.join(LEGACY_PORTMASTER_DIR, "libs")
-            libs_exists = os.path.exists(libs_dir)
-            for item in os.listdir(LEGACY_PORTMASTER_DIR):
-                if item != "libs":
-                    item_path = os.path.join(LEGACY_PORTMASTER_DIR, item)
-                    if os.path.isfile(item_path):
-                        os.remove(item_path)
-                    elif os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-        
-        with zipfile.ZipFile(TEMP_FILE, 'r') as zip_ref:
-            total_files = len(zip_ref.namelist())
-            for i, file in enumerate(zip_ref.namelist()):
-                if "libs/" in file:
-                    continue
-                    
-                zip_ref.extract(file, TEMP_DIR)
-                
-                percent = (i + 1) * 100 / total_files
-                gr.draw_clear()
-                gr.draw_text((x_size / 2, y_size / 2 - 60), translator.translate('Unpacking the PortMaster...'), font=23, anchor="mm")
-                gr.draw_text((x_size / 2, y_size / 2 - 30), f"{translator.translate('File')}: {os.path.basename(file)}", font=19, anchor="mm")
-                
-                bar_width = x_size - 100
-                gr.draw_rectangle([50, y_size / 2 + 20, 50 + bar_width, y_size / 2 + 40], fill=gr.colorGrayL1)
-                
-                filled_width = int(bar_width * percent / 100)
-                if filled_width > 0:
-                    gr.draw_rectangle([50, y_size / 2 + 20, 50 + filled_width, y_size / 2 + 40], fill=gr.colorBlue)
-                
-                gr.draw_text((x_size / 2, y_size / 2 + 30), f"{int(percent)}%", font=19, anchor="mm")
-                gr.draw_paint()
-        
-        portmaster_dir = os.path.join(TEMP_DIR, "PortMaster")
-        if os.path.isdir(portmaster_dir):
-            for item in os.listdir(portmaster_dir):
-                src = os.path.join(portmaster_dir, item)
-                dst = os.path.join(LEGACY_PORTMASTER_DIR, item)
-                if item == "libs" and libs_exists:
-                    continue
-                shutil.move(src, dst)
-            os.rmdir(portmaster_dir)
-
-        pylibs_zip = os.path.join(LEGACY_PORTMASTER_DIR, "pylibs.zip")
-        if os.path.exists(pylibs_zip):
-            try:
-                with zipfile.ZipFile(pylibs_zip, 'r') as zip_ref:
-                    zip_ref.extractall(LEGACY_PORTMASTER_DIR)
-                os.remove(pylibs_zip)
-                logger.info("pylibs.zip успешно распакован")
-            except Exception as e:
-                logger.error(f"Ошибка при распаковке pylibs.zip: {e}")
-        
-        for root, _, files in os.walk(LEGACY_PORTMASTER_DIR):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if file.endswith(('.sh', '.py')) or file == 'PortMaster':
-                    os.chmod(file_path, 0o755)
-                elif 'runtimes' in root and file.endswith('.aarch64'):
-                    os.chmod(file_path, 0o755)
-                    try:
-                        subprocess.run(['sudo', 'chmod', '755', file_path], check=True)
-                        logger.info(f"Установлены права на {file} через sudo")
-                    except subprocess.CalledProcessError as e:
-                        logger.error(f"Ошибка установки прав через sudo на {file}: {e}")
-        
+
+        installer = ZipInstaller(PORTMASTER_ZIP, LEGACY_PORTMASTER_DIR)
+        progress = ProgressReporter(show_unpack_progress)
+        progress.run(installer.install, progress.update)
+
+        batch = PrivilegedBatch("Права рантаймов")
+        for file_path in installer.executables:
+            if 'runtimes' in file_path and file_path.endswith('.aarch64'):
+                batch.chmod(0o755, file_path)
+        batch.run()
+
         version_file = os.path.join(LEGACY_PORTMASTER_DIR, "version")
         with open(version_file, "w") as f:
             f.write(port_master_github_version)
             logger.info(f"Сохранена версия: {port_master_github_version}")
-        
-        os.remove(TEMP_FILE)
-        shutil.rmtree(TEMP_DIR)
+
+        os.remove(PORTMASTER_ZIP)
 
         os.environ['LANG'] = system_lang
         os.environ['LANGUAGE'] = system_lang
@@ -694,29 +646,30 @@ def check_runtimes_version() -> bool:
     libs_dir = os.path.join(LEGACY_PORTMASTER_DIR, "libs")
     os.makedirs(libs_dir, exist_ok=True)
 
+    global runtimes_release_info
+
     try:
-        response = requests.get(RUNTIMES_API_URL, timeout=10)
-        response.raise_for_status()
-        release_info = response.json()
+        release_info = release_cache.get(RUNTIMES_API_URL)
+        runtimes_release_info = release_info
 
-        download_urls = [asset["browser_download_url"] for asset in release_info.get("assets", [])]
-        if not download_urls:
+        assets = [asset for asset in release_info.get("assets", []) if asset.get("browser_download_url")]
+        if not assets:
             logger.error("Не найдены файлы для скачивания в релизе рантаймов")
             return False
 
-        installed_files = set(os.listdir(libs_dir)) if os.path.exists(libs_dir) else set()
+        fetch, delete = runtime_sync.plan(assets)
+        # Hashes runtimes that changed on the card since they were last checked
+        runtime_sync.verify_in_background()
 
-        missing_files = []
-        for url in download_urls:
-            filename = os.path.basename(url)
-            if filename not in installed_files:
-                missing_files.append(url)
+        # Dropped runtimes need no download, so no prompt either
+        for name in delete:
+            runtime_sync.remove(name)
 
-        if not missing_files:
+        if not fetch:
             logger.info("Все файлы рантаймов установлены")
             return True
 
-        logger.info(f"Найдено {len(missing_files)} отсутствующих файлов рантаймов")
+        logger.info(f"Рантаймы: скачать {len(fetch)}, удалить {len(delete)}")
         return False
 
     except requests.exceptions.RequestException as e:
@@ -753,125 +706,47 @@ def load_creen_runtimes() -> None:
 def load_screen_process_download_runtimes() -> None:
     global selected_position, selected_system, skip_input_check
 
-    temp_dir = "/tmp/PortMaster_Runtime_Update"
     libs_dir = os.path.join(LEGACY_PORTMASTER_DIR, "libs")
-
-    shutil.rmtree(temp_dir, ignore_errors=True)
-    os.makedirs(temp_dir, exist_ok=True)
     os.makedirs(libs_dir, exist_ok=True)
 
     try:
-        response = requests.get(RUNTIMES_API_URL, timeout=10)
-        response.raise_for_status()
-        release_info = response.json()
+        # Normally already fetched by check_runtimes_version
+        release_info = runtimes_release_info or release_cache.get(RUNTIMES_API_URL)
     except Exception as e:
         logger.error(f"Ошибка получения информации о рантаймах: {e}")
         return
 
-    download_urls = [asset["browser_download_url"] for asset in release_info.get("assets", [])]
-    if not download_urls:
+    assets = [asset for asset in release_info.get("assets", []) if asset.get("browser_download_url")]
+    if not assets:
         logger.error("Не удалось получить URL для скачивания рантаймов")
         return
 
-    installed_files = set(os.listdir(libs_dir)) if os.path.exists(libs_dir) else set()
-    
-    missing_files = []
-    for url in download_urls:
-        filename = os.path.basename(url)
-        if filename not in installed_files:
-            missing_files.append(url)
+    fetch, delete = runtime_sync.plan(assets)
+    for name in delete:
+        runtime_sync.remove(name)
 
-    if not missing_files:
+    scheduler = DownloadScheduler(workers=RUNTIME_DOWNLOAD_WORKERS)
+    downloads = {}
+    for asset in fetch:
+        task = scheduler.add(asset["browser_download_url"], os.path.join(libs_dir, asset_file(asset)), asset.get("size", 0), asset.get("digest") or "")
+        downloads[task] = asset
+
+    if not scheduler.tasks:
         gr.draw_clear()
         gr.draw_text((x_size / 2, y_size / 2), "Все файлы рантаймов уже установлены", font=23, anchor="mm")
         gr.draw_paint()
         time.sleep(3)
         return
 
-    success_count = 0
-    total_files = len(missing_files)
-    failed_files = []
-    current_filename = ""
-    
-    def show_progress(block_num, block_size, total_size):
-        nonlocal current_filename
-
-        try:
-            downloaded = block_num * block_size
-            if total_size > 0:
-                percent = min(100, downloaded * 100 / total_size)
-                mb_size = total_size / 1048576
-                gr.draw_clear()
-                gr.draw_text((x_size / 2, y_size / 2 - 90), f"{translator.translate('Downloading runtimes...')}", font=23, anchor="mm")
-                gr.draw_text((x_size / 2, y_size / 2 - 60), f"{translator.translate('File')}: {current_filename}", font=19, anchor="mm")
-                gr.draw_text((x_size / 2, y_size / 2 - 30), f"{translator.translate('Size')}: {mb_size:.2f} MB", font=19, anchor="mm")
-                gr.draw_text((x_size / 2, y_size / 2), f"{translator.translate('Progress')}: {success_count+1}/{total_files}", font=19, anchor="mm")
-                
-                bar_width = x_size - 100
-                gr.draw_rectangle([50, y_size / 2 + 20, 50 + bar_width, y_size / 2 + 40], fill=gr.colorGrayL1)
-                
-                filled_width = int(bar_width * percent / 100)
-                if filled_width > 0:
-                    gr.draw_rectangle([50, y_size / 2 + 20, 50 + filled_width, y_size / 2 + 40], fill=gr.colorBlue)
-                
-                gr.draw_text((x_size / 2, y_size / 2 + 30), f"{int(percent)}%", font=19, anchor="mm")
-                gr.draw_paint()
-        except Exception as e:
-            logger.error(f"Ошибка в функции обратного вызова: {str(e)}")
-
-    for i, url in enumerate(missing_files):
-        current_filename = os.path.basename(url)
-        output_file = os.path.join(temp_dir, current_filename)
+    total_files = len(scheduler.tasks)
+    logger.info(f"Скачивание {total_files} рантаймов, потоков: {RUNTIME_DOWNLOAD_WORKERS}")
+    tasks = scheduler.run(show_runtimes_progress)
+    for task in tasks:
+        if task.state == "done":
+            runtime_sync.record(downloads[task])
+    success_count = sum(1 for task in tasks if task.state == "done")
+    failed_files = [task.name for task in tasks if task.state != "done"]
 
-        try:
-            gr.draw_clear()
-            gr.draw_text((x_size / 2, y_size / 2 - 90), f"{translator.translate('Downloading runtimes...')}", font=23, anchor="mm")
-            gr.draw_text((x_size / 2, y_size / 2 - 60), f"{translator.translate('File')}: {current_filename}", font=19, anchor="mm")
-            gr.draw_text((x_size / 2, y_size / 2), f"{translator.translate('Progress')}: {i+1}/{total_files}", font=19, anchor="mm")
-            gr.draw_rectangle([50, y_size / 2 + 20, 50 + (x_size - 100), y_size / 2 + 40], fill=gr.colorGrayL1)
-            gr.draw_text((x_size / 2, y_size / 2 + 30), "0%", font=19, anchor="mm")
-            gr.draw_paint()
-
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 512 * 1024  # 512KB blocks
-            downloaded = 0
-            block_num = 0
-
-            with open(output_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=block_size):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        block_num += 1
-                        show_progress(block_num, block_size, total_size)
-
-            file_size = os.path.getsize(output_file)
-
-            if file_size > 1000:
-                logger.info(f"Успешно скачан: {current_filename} ({file_size} байт)")
-                success_count += 1
-            else:
-                logger.warning(f"Файл {current_filename} слишком мал или пуст ({file_size} байт), пропускаем")
-                os.remove(output_file)
-                failed_files.append(current_filename)
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка скачивания {current_filename}: {e}")
-            failed_files.append(current_filename)
-        except Exception as e:
-            logger.error(f"Ошибка скачивания {current_filename}: {str(e)}")
-            failed_files.append(current_filename)
-    
-    if success_count > 0:
-        for filename in os.listdir(temp_dir):
-            src = os.path.join(temp_dir, filename)
-            dst = os.path.join(libs_dir, filename)
-            shutil.copy2(src, dst)
-            os.chmod(dst, 0o644)  
-    
     try:
         gr.draw_clear()
         if success_count > 0:
@@ -893,8 +768,40 @@ def load_screen_process_download_runtimes() -> None:
         time.sleep(3)
     except Exception as e:
         logger.error(f"Ошибка при отображении результатов: {str(e)}")
-    
-    shutil.rmtree(temp_dir, ignore_errors=True)
+
+def show_runtimes_progress(scheduler: DownloadScheduler) -> None:
+    try:
+        total = scheduler.total_bytes
+        done = scheduler.done_bytes
+        percent = min(100, done * 100 / total) if total > 0 else 0
+        finished = sum(1 for task in scheduler.tasks if task.state in ("done", "failed"))
+
+        gr.draw_clear()
+        gr.draw_text((x_size / 2, 40), f"{translator.translate('Downloading runtimes...')}", font=23, anchor="mm")
+        gr.draw_text((x_size / 2, 75), f"{done / 1048576:.1f} / {total / 1048576:.1f} MB   {scheduler.throughput / 1048576:.2f} MB/s", font=19, anchor="mm")
+
+        bar_width = x_size - 100
+        gr.draw_rectangle([50, 95, 50 + bar_width, 115], fill=gr.colorGrayL1)
+        filled_width = int(bar_width * percent / 100)
+        if filled_width > 0:
+            gr.draw_rectangle([50, 95, 50 + filled_width, 115], fill=gr.colorBlue)
+        gr.draw_text((x_size / 2, 105), f"{int(percent)}%", font=19, anchor="mm")
+        gr.draw_text((x_size / 2, 140), f"{translator.translate('Progress')}: {finished}/{len(scheduler.tasks)}", font=19, anchor="mm")
+
+        # Active transfers first, then what is still waiting, then finished ones
+        order = {"downloading": 0, "queued": 1, "failed": 2, "done": 3}
+        rows = sorted(scheduler.tasks, key=lambda task: order[task.state])[:(y_size - 200) // 28]
+        for i, task in enumerate(rows):
+            if task.state == "downloading":
+                status = f"{int(task.downloaded * 100 / task.size)}%" if task.size else f"{task.downloaded / 1048576:.1f} MB"
+            else:
+                status = translator.translate(task.state.capitalize())
+            name = task.name if len(task.name) <= 36 else task.name[:33] + "..."
+            gr.draw_text((50, 175 + i * 28), name, font=17, anchor="lm")
+            gr.draw_text((x_size - 50, 175 + i * 28), status, font=17, anchor="rm")
+        gr.draw_paint()
+    except Exception as e:
+        logger.error(f"Ошибка отображения прогресса: {str(e)}")
 
 
 def ports_fix():
@@ -909,66 +816,33 @@ def ports_fix():
         stock_path = f"{controlfolder}/Ubuntu"
         global fix_flg_grh
 
-        def insert_lines_after(filename, search, lines):
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    content = f.readlines()
-                for idx, line in enumerate(content):
-                    if search in line:
-                        break
-                else:
-                    return False
-                idx += 1
-                for l in reversed(lines):
-                    content.insert(idx, l + '\n')
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.writelines(content)
-                return True
-            except Exception as e:
-                logger.error(f"Ошибка при вставке строк в {filename}: {e}")
-                return False
-
         if os.path.isfile(device_info_txt):
-            with open(device_info_txt, encoding='utf-8') as f:
-                if fix_flg_grh not in f.read():
-                    with open(device_info_txt, 'r', encoding='utf-8') as f2:
-                        lines = f2.readlines()
-                    lines.insert(1, f"# {fix_flg_grh}\n")
-                    with open(device_info_txt, 'w', encoding='utf-8') as f2:
-                        f2.writelines(lines)
-                    search = 'DEVICE_NAME=$(cat /storage/.config/device)'
-                    block = [
-                        '    elif [[ "$CFW_NAME" == "Ubuntu" ]] && [[ -f "/mnt/vendor/oem/board.ini" ]]; then',
-                        '        declare -A device_name_mapping=(',
-                        '            ["RG28xx"]="RG28XX-H"',
-                        '            ["RG34xx"]="RG34XX-H"',
-                        '            ["RG34xxSP"]="RG34XX-SP"',
-                        '            ["RG35xx+_P"]="RG35XX-PLUS"',
-                        '            ["RG35xxH"]="RG35XX-H"',
-                        '            ["RG35xxPRO"]="RG35XX-PRO"',
-                        '            ["RG35xxSP"]="RG35XX-SP"',
-                        '            ["RG40xxH"]="RG40XX-H"',
-                        '            ["RG40xxV"]="RG40XX-V"',
-                        '            ["RGcubexx"]="RGCUBEXX-H"',
-                        '        )',
-                        '        DEVICE_NAME=$(cat /mnt/vendor/oem/board.ini)',
-                        '        DEVICE_NAME=${device_name_mapping[$DEVICE_NAME]}'
-                    ]
-                    if not insert_lines_after(device_info_txt, search, block):
-                        logger.error("Ошибка при обновлении device_info.txt")
-                        return False
+            block = [
+                '    elif [[ "$CFW_NAME" == "Ubuntu" ]] && [[ -f "/mnt/vendor/oem/board.ini" ]]; then',
+                '        declare -A device_name_mapping=(',
+                '            ["RG28xx"]="RG28XX-H"',
+                '            ["RG34xx"]="RG34XX-H"',
+                '            ["RG34xxSP"]="RG34XX-SP"',
+                '            ["RG35xx+_P"]="RG35XX-PLUS"',
+                '            ["RG35xxH"]="RG35XX-H"',
+                '            ["RG35xxPRO"]="RG35XX-PRO"',
+                '            ["RG35xxSP"]="RG35XX-SP"',
+                '            ["RG40xxH"]="RG40XX-H"',
+                '            ["RG40xxV"]="RG40XX-V"',
+                '            ["RGcubexx"]="RGCUBEXX-H"',
+                '        )',
+                '        DEVICE_NAME=$(cat /mnt/vendor/oem/board.ini)',
+                '        DEVICE_NAME=${device_name_mapping[$DEVICE_NAME]}'
+            ]
+            if not patcher.apply(device_info_txt, fix_flg_grh, [
+                Insert(f"# {fix_flg_grh}", offset=1),
+                Insert("\n".join(block), anchor='DEVICE_NAME=$(cat /storage/.config/device)', offset=1),
+            ]):
+                logger.error("Ошибка при обновлении device_info.txt")
+                return False
 
         if os.path.isfile(control_txt):
-            with open(control_txt, encoding='utf-8') as f:
-                if fix_flg_grh not in f.read():
-                    with open(control_txt, 'r', encoding='utf-8') as f2:
-                        lines = f2.readlines()
-                    lines.insert(1, f"# {fix_flg_grh}\n")
-                    lines = [l.replace('    DEVICE="${1}"', '    DEVICE="19000000010000000100000000010000"') for l in lines]
-                    lines = [l.replace('param_device="${2}"', '    param_device="anbernic"') for l in lines]
-                    with open(control_txt, 'w', encoding='utf-8') as f2:
-                        f2.writelines(lines)
-                    heredoc = '''
+            heredoc = '''
 export CUR_TTY=/dev/null
 export HOME="/root"
 mkdir -p ~/.local/share
@@ -1009,18 +883,19 @@ if [[ -e "/dev/input/by-path/platform-soc@03000000:gpio_keys-event-joystick" ]];
     fi
 fi
 '''
-                    with open(control_txt, 'a', encoding='utf-8') as f2:
-                        f2.write(heredoc)
+            patcher.apply(control_txt, fix_flg_grh, [
+                Insert(f"# {fix_flg_grh}", offset=1),
+                Replace('    DEVICE="${1}"', '    DEVICE="19000000010000000100000000010000"'),
+                Replace('param_device="${2}"', '    param_device="anbernic"'),
+                Append(heredoc),
+            ])
 
         if os.path.isfile(gamecontrollerdb_txt):
-            with open(gamecontrollerdb_txt, encoding='utf-8') as f:
-                if fix_flg_grh not in f.read():
-                    heredoc = '''
+            heredoc = '''
 # make by G.R.H
 19000000010000000100000000010000,ANBERNIC-keys,a:b0,b:b1,x:b3,y:b2,back:b8,guide:b6,start:b7,leftstick:b9,rightstick:b12,leftshoulder:b4,rightshoulder:b5,dpup:h0.1,dpleft:h0.8,dpdown:h0.4,dpright:h0.2,leftx:a0,lefty:a1,rightx:a2,righty:a3,lefttrigger:b10,righttrigger:b11,platform:Linux,
 '''
-                    with open(gamecontrollerdb_txt, 'a', encoding='utf-8') as f2:
-                        f2.write(heredoc)
+            patcher.apply(gamecontrollerdb_txt, fix_flg_grh, [Append(heredoc)])
 
         if not os.path.isfile(mod_Stock_txt):
             heredoc = '''#!/bin/bash
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from typing import Callable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 512 * 1024
+
+
+class CorruptDownload(IOError):
+    """The data does not match the release metadata; the partial file is useless"""
+
+
+class DownloadStopped(Exception):
+    """stop() was called; the partial file is kept for next time"""
+
+
+class DownloadTask:
+    def __init__(self, url: str, dest: str, size: int = 0, digest: str = ""):
+        self.url = url
+        self.dest = dest
+        self.name = os.path.basename(dest)
+        self.size = size
+        # GitHub asset digest, "sha256:<hex>"
+        self.digest = digest
+        # What a partial file must have been started for to be continued
+        self.meta = {"url": url, "size": size, "digest": digest}
+        self.downloaded = 0
+        self.resumed = 0
+        # Hash state of the partial file and how many of its bytes it covers,
+        # so a retry in the same session does not read the file again
+        self.hasher = None
+        self.hashed = 0
+        self.state = "queued"
+        self.error = ""
+
+    @property
+    def part_path(self) -> str:
+        return f"{self.dest}.part"
+
+    @property
+    def meta_path(self) -> str:
+        return f"{self.dest}.part.json"
+
+    def discard(self) -> None:
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.downloaded = 0
+        self.resumed = 0
+        self.hasher = None
+        self.hashed = 0
+
+
+class DownloadScheduler:
+    """Runs downloads over one shared requests.Session, a few at a time.
+
+    Every file is streamed into "<dest>.part" next to its destination and
+    renamed into place once complete, so nothing is copied afterwards and a
+    half-written file never carries the final name. A partial file left by
+    a dropped connection is continued with a Range request, both within a
+    run and on the next one; "<dest>.part.json" records what it belongs to.
+    Data is hashed while it streams and checked against the size and digest
+    from the release metadata; a partial that fails the check is deleted.
+
+    run() downloads in the foreground. start() lets the workers go on in the
+    background, at a lower CPU priority if nice is set, until wait() or
+    stop() is called; promote() moves what is left to workers at normal
+    priority once the user is waiting on it.
+    """
+
+    def __init__(self, workers: int = 3, session: Optional[requests.Session] = None, attempts: int = 3, nice: int = 0):
+        self.workers = workers
+        self.attempts = attempts
+        self.nice = nice
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.tasks: List[DownloadTask] = []
+        self.started = 0.0
+        self.__threads: List[threading.Thread] = []
+        self.__stop = threading.Event()
+        self.__lock = threading.Lock()
+        self.__thread_state = threading.local()
+        # Set to retire the current generation of workers
+        self.__retire = threading.Event()
+
+    def add(self, url: str, dest: str, size: int = 0, digest: str = "") -> DownloadTask:
+        task = DownloadTask(url, dest, size, digest)
+        self.tasks.append(task)
+        return task
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(task.size for task in self.tasks)
+
+    @property
+    def done_bytes(self) -> int:
+        return sum(task.downloaded for task in self.tasks)
+
+    @property
+    def throughput(self) -> float:
+        """Average bytes per second since run() started, resumed bytes not counted"""
+        elapsed = time.monotonic() - self.started
+        fetched = self.done_bytes - sum(task.resumed for task in self.tasks)
+        return fetched / elapsed if elapsed > 0 else 0.0
+
+    def run(self, on_progress: Optional[Callable[["DownloadScheduler"], None]] = None, interval: float = 0.25) -> List[DownloadTask]:
+        """Download everything, calling on_progress from this thread every interval seconds"""
+        self.start()
+        return self.wait(on_progress, interval)
+
+    def start(self) -> None:
+        if self.__threads:
+            return
+        self.started = time.monotonic()
+        self.__spawn()
+
+    def __spawn(self) -> None:
+        # New threads inherit the priority of the thread that creates them
+        retire = self.__retire
+        self.__threads = [threading.Thread(target=self.__worker, args=(retire,), daemon=True) for _ in range(min(self.workers, len(self.tasks)))]
+        for thread in self.__threads:
+            thread.start()
+
+    def promote(self) -> None:
+        """Continue at normal priority, call from a thread running at it.
+
+        Without root a lowered nice value can't be raised again, so the
+        background workers are retired after their chunk in flight and new
+        ones started from this thread go on from their partial files.
+        """
+        if not self.nice or not self.__threads:
+            self.nice = 0
+            return
+        self.nice = 0
+        self.__retire.set()
+        for thread in self.__threads:
+            thread.join()
+        self.__retire = threading.Event()
+        if any(task.state == "queued" for task in self.tasks):
+            logger.info("Загрузка продолжается с обычным приоритетом")
+            self.__spawn()
+
+    def stop(self) -> None:
+        """Ask the workers to finish; they stop after the chunk in flight"""
+        self.__stop.set()
+
+    def wait(self, on_progress: Optional[Callable[["DownloadScheduler"], None]] = None, interval: float = 0.25) -> List[DownloadTask]:
+        self.start()
+        threads = self.__threads
+        while any(thread.is_alive() for thread in threads):
+            if on_progress:
+                on_progress(self)
+            for thread in threads:
+                thread.join(interval / len(threads))
+        if on_progress:
+            on_progress(self)
+        elapsed = time.monotonic() - self.started
+        logger.info(f"Загрузка завершена: {self.done_bytes} байт за {elapsed:.1f} с, {self.throughput / 1048576:.2f} МБ/с")
+        return self.tasks
+
+    def __next_task(self, retire: threading.Event) -> Optional[DownloadTask]:
+        if self.__stop.is_set() or retire.is_set():
+            return None
+        with self.__lock:
+            for task in self.tasks:
+                if task.state == "queued":
+                    task.state = "downloading"
+                    return task
+        return None
+
+    def __worker(self, retire: threading.Event) -> None:
+        self.__thread_state.retire = retire
+        if self.nice:
+            try:
+                # Linux applies nice values per thread
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            except (AttributeError, OSError) as e:
+                logger.warning(f"Не удалось понизить приоритет загрузки: {e}")
+        while True:
+            task = self.__next_task(retire)
+            if task is None:
+                return
+            try:
+                self.fetch(task)
+                task.state = "done"
+                logger.info(f"Успешно скачан: {task.name} ({task.downloaded} байт)")
+            except DownloadStopped:
+                task.state = "queued"
+                logger.info(f"Загрузка {task.name} остановлена на {task.downloaded} байт")
+            except Exception as e:
+                task.state = "failed"
+                task.error = str(e)
+                logger.error(f"Ошибка скачивания {task.name}: {e}")
+                if isinstance(e, CorruptDownload):
+                    task.discard()
+
+    def fetch(self, task: DownloadTask) -> None:
+        if self.complete(task):
+            logger.info(f"{task.name} уже скачан")
+            task.downloaded = task.resumed = task.size
+            return
+        for attempt in range(1, self.attempts + 1):
+            hasher = self.resume(task)
+            try:
+                if not task.size or task.downloaded < task.size:
+                    hasher = self.stream(task, hasher)
+                self.verify(task, hasher)
+                break
+            except CorruptDownload as e:
+                logger.warning(f"Повреждённая загрузка {task.name}, начинаем заново: {e}")
+                task.discard()
+                if attempt == self.attempts:
+                    raise
+            except (requests.exceptions.RequestException, IOError) as e:
+                if attempt == self.attempts:
+                    raise
+                logger.warning(f"Обрыв загрузки {task.name} на {task.downloaded} байт, попытка {attempt + 1}: {e}")
+                time.sleep(attempt)
+
+        os.chmod(task.part_path, 0o644)
+        os.replace(task.part_path, task.dest)
+        os.remove(task.meta_path)
+
+    @staticmethod
+    def complete(task: DownloadTask) -> bool:
+        """Whether dest already holds exactly this file; needs a digest, the size alone proves nothing"""
+        algorithm, _, expected = task.digest.partition(":")
+        if not algorithm or not task.size:
+            return False
+        try:
+            if os.path.getsize(task.dest) != task.size:
+                return False
+            hasher = hashlib.new(algorithm)
+            with open(task.dest, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+            return hasher.hexdigest() == expected
+        except OSError:
+            return False
+
+    @staticmethod
+    def resume(task: DownloadTask):
+        """Picks up the partial file if it belongs to this task; returns the hasher fed with its bytes"""
+        algorithm, _, _ = task.digest.partition(":")
+        hasher = hashlib.new(algorithm) if algorithm else None
+        try:
+            with open(task.meta_path, "r", encoding="utf-8") as f:
+                usable = json.load(f) == task.meta
+            offset = os.path.getsize(task.part_path)
+        except (OSError, ValueError):
+            usable, offset = False, 0
+        if not usable or (task.size and offset > task.size):
+            task.discard()
+            with open(task.meta_path, "w", encoding="utf-8") as f:
+                json.dump(task.meta, f)
+            return hasher
+
+        if hasher and task.hasher is not None and task.hashed == offset:
+            # Carried over from the previous attempt in this session
+            hasher = task.hasher
+        elif hasher:
+            # Hashing a local file is far quicker than fetching it again
+            with open(task.part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        task.hasher, task.hashed = hasher, offset
+        task.downloaded = task.resumed = offset
+        if offset:
+            logger.info(f"Продолжение загрузки {task.name} с {offset} байт")
+        return hasher
+
+    def stream(self, task: DownloadTask, hasher):
+        """Fetches the rest of the file; returns the hasher, a new one if the server restarted from zero"""
+        headers = {"Range": f"bytes={task.downloaded}-"} if task.downloaded else {}
+        with self.session.get(task.url, stream=True, timeout=30, headers=headers) as response:
+            if response.status_code == 416:
+                # "bytes */N": the partial may already hold the whole file
+                total = response.headers.get("Content-Range", "").partition("*/")[2]
+                if task.downloaded and total.isdigit() and int(total) == task.downloaded:
+                    logger.info(f"{task.name} уже скачан полностью")
+                    task.size = task.size or task.downloaded
+                    return hasher
+                raise CorruptDownload("сервер отклонил диапазон")
+            response.raise_for_status()
+            if task.downloaded and response.status_code != 206:
+                logger.info(f"Сервер не поддерживает докачку {task.name}")
+                if hasher:
+                    hasher = hashlib.new(hasher.name)
+                task.downloaded = task.resumed = 0
+                task.hasher, task.hashed = hasher, 0
+            length = int(response.headers.get("content-length", 0))
+            if length and not task.size:
+                task.size = task.downloaded + length
+            with open(task.part_path, "ab" if task.downloaded else "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if self.__stop.is_set() or self.__thread_state.retire.is_set():
+                        raise DownloadStopped()
+                    if chunk:
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                        task.downloaded += len(chunk)
+                        task.hashed = task.downloaded
+        return hasher
+
+    @staticmethod
+    def verify(task: DownloadTask, hasher) -> None:
+        if task.size and task.downloaded < task.size:
+            raise IOError(f"получено {task.downloaded} из {task.size} байт")
+        if task.size and task.downloaded > task.size:
+            raise CorruptDownload(f"получено {task.downloaded} байт вместо {task.size}")
+        if not task.downloaded:
+            raise IOError("пустой файл")
+        if hasher and hasher.hexdigest() != task.digest.partition(":")[2]:
+            raise CorruptDownload(f"контрольная сумма не совпадает с {task.digest}")
@@ -0,0 +1,266 @@
+import io
+import os
+import shutil
+import stat
+import zipfile
+import zlib
+import logging
+from typing import Callable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+COPY_SIZE = 256 * 1024
+
+
+def file_crc(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_SIZE)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+def default_mode(name: str) -> int:
+    """Permissions for entries that carry none, the rules the old installer applied"""
+    base = os.path.basename(name)
+    if base.endswith((".sh", ".py")) or base == "PortMaster":
+        return 0o755
+    if "runtimes/" in name and base.endswith(".aarch64"):
+        return 0o755
+    return 0o644
+
+
+def entry_mode(info: zipfile.ZipInfo) -> int:
+    mode = (info.external_attr >> 16) & 0o777
+    if info.create_system != 3 or not mode:
+        # Not made on Unix, no permission bits stored
+        return default_mode(info.filename)
+    if default_mode(info.filename) == 0o755:
+        # Scripts and binaries stay executable whatever the zip says
+        mode |= 0o755
+    return mode
+
+
+def parents(name: str) -> Iterator[str]:
+    parts = name.split("/")[:-1]
+    for i in range(1, len(parts) + 1):
+        yield "/".join(parts[:i])
+
+
+def supports_hardlinks(directory: str) -> bool:
+    probe = os.path.join(directory, ".link-probe")
+    link = f"{probe}-link"
+    try:
+        with open(probe, "wb"):
+            pass
+        os.link(probe, link)
+        return True
+    except OSError:
+        # FAT and exFAT cards have no hard links
+        return False
+    finally:
+        for path in (link, probe):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def recover_interrupted_install(dest_dir: str) -> None:
+    """Undo what an install cut off halfway through the directory swap left behind"""
+    staging, old = f"{dest_dir}.new", f"{dest_dir}.old"
+    if not os.path.exists(dest_dir) and os.path.isdir(old):
+        logger.warning(f"Восстановление {dest_dir} после прерванной установки")
+        os.rename(old, dest_dir)
+    if os.path.isdir(staging):
+        libs = os.path.join(staging, "libs")
+        if os.path.isdir(libs) and not os.path.exists(os.path.join(dest_dir, "libs")):
+            os.rename(libs, os.path.join(dest_dir, "libs"))
+        shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+class ZipInstaller:
+    """Installs a release zip into dest_dir, writing only what changed.
+
+    Where the card supports hard links, entries are extracted into
+    "<dest_dir>.new" on the same filesystem, unchanged files (same size and
+    CRC) are hard-linked from the installed copy, the preserved directories
+    are moved over and the two trees swapped with renames, so PortMaster is
+    either the old or the new version; recover_interrupted_install() finishes
+    a swap that was cut off. FAT and exFAT cards have no hard links, and
+    copying every unchanged file into staging would rewrite the whole tree,
+    so there the install is done in place instead: changed files are
+    replaced one by one and stale ones removed. An update cut off halfway
+    leaves a mix of versions, but the version file is only written after
+    install(), so the update is offered again on the next launch.
+
+    As the old installer did, outer entries containing "libs/" (libs and
+    pylibs) are skipped, pylibs comes from the nested pylibs.zip.
+    """
+
+    def __init__(self, zip_path: str, dest_dir: str, prefix: str = "PortMaster/",
+                 preserve: tuple = ("libs",), nested: tuple = ("pylibs.zip",), skip: str = "libs/"):
+        self.zip_path = zip_path
+        self.dest_dir = dest_dir
+        self.staging = f"{dest_dir}.new"
+        self.prefix = prefix
+        self.preserve = preserve
+        self.nested = nested
+        self.skip = skip
+        self.written = 0
+        self.reused = 0
+        self.removed = 0
+        self.executables: List[str] = []
+        self.__moved: List[tuple] = []
+        self.__in_place = False
+        self.__installed: Set[str] = set()
+
+    def install(self, on_progress: Optional[Callable[[int, int, str], None]] = None) -> None:
+        recover_interrupted_install(self.dest_dir)
+        self.__in_place = os.path.isdir(self.dest_dir) and not supports_hardlinks(os.path.dirname(self.dest_dir))
+        if not self.__in_place:
+            os.makedirs(self.staging)
+        try:
+            with zipfile.ZipFile(self.zip_path) as archive:
+                entries = [
+                    info for info in archive.infolist()
+                    if info.filename.startswith(self.prefix)
+                    and self.skip not in info.filename
+                    and not self.is_preserved(info.filename[len(self.prefix):])
+                ]
+                for i, info in enumerate(entries):
+                    name = info.filename[len(self.prefix):]
+                    if name in self.nested:
+                        with archive.open(info) as nested_file:
+                            # Nested zips need seeking, they are small enough to hold in memory
+                            self.extract_all(zipfile.ZipFile(io.BytesIO(nested_file.read())), "")
+                    else:
+                        self.extract(archive, info, name)
+                    if on_progress:
+                        on_progress(i + 1, len(entries), name)
+            if self.__in_place:
+                self.remove_stale()
+            else:
+                self.swap()
+        except Exception:
+            if not self.__in_place:
+                self.rollback()
+            raise
+        mode = "на месте" if self.__in_place else "через замену каталога"
+        logger.info(f"Установка {mode} завершена: записано {self.written}, без изменений {self.reused}, удалено {self.removed}")
+
+    def is_preserved(self, name: str) -> bool:
+        return any(name == keep or name.startswith(f"{keep}/") for keep in self.preserve)
+
+    def extract_all(self, archive: zipfile.ZipFile, prefix: str) -> None:
+        for info in archive.infolist():
+            name = prefix + info.filename
+            if not self.is_preserved(name):
+                self.extract(archive, info, name)
+
+    def extract(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo, name: str) -> None:
+        name = name.rstrip("/") if info.is_dir() else name
+        if not name:
+            return
+        if name.startswith("/") or ".." in name.split("/"):
+            logger.warning(f"Пропущен недопустимый путь в архиве: {info.filename}")
+            return
+        root = self.dest_dir if self.__in_place else self.staging
+        target = os.path.join(root, name)
+        self.__installed.add(name)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        self.__installed.update(parents(name))
+        mode = entry_mode(info)
+        installed = os.path.join(self.dest_dir, name)
+        if mode & 0o111:
+            self.executables.append(installed)
+
+        if self.__in_place:
+            if self.unchanged(installed, info):
+                self.reused += 1
+                if stat.S_IMODE(os.stat(installed).st_mode) == mode:
+                    return
+            else:
+                tmp_path = f"{target}.tmp"
+                with archive.open(info) as src, open(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, COPY_SIZE)
+                os.replace(tmp_path, target)
+                self.written += 1
+        else:
+            if os.path.lexists(target):
+                # The same path shipped twice, the later entry wins as with extraction over it
+                os.remove(target)
+            if self.unchanged(installed, info) and self.link(installed, target):
+                self.reused += 1
+            else:
+                with archive.open(info) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, COPY_SIZE)
+                self.written += 1
+        os.chmod(target, mode)
+
+    @staticmethod
+    def unchanged(installed: str, info: zipfile.ZipInfo) -> bool:
+        try:
+            st = os.lstat(installed)
+            return stat.S_ISREG(st.st_mode) and st.st_size == info.file_size and file_crc(installed) == info.CRC
+        except OSError:
+            return False
+
+    @staticmethod
+    def link(installed: str, target: str) -> bool:
+        try:
+            os.link(installed, target)
+            return True
+        except OSError as e:
+            logger.warning(f"Не удалось создать ссылку на {installed}: {e}")
+            return False
+
+    def remove_stale(self) -> None:
+        """In-place installs: delete what the new version no longer ships"""
+        for dirpath, dirnames, filenames in os.walk(self.dest_dir, topdown=False):
+            rel_dir = os.path.relpath(dirpath, self.dest_dir)
+            rel_dir = "" if rel_dir == "." else f"{rel_dir}/"
+            for filename in filenames:
+                name = rel_dir + filename
+                if name not in self.__installed and not self.is_preserved(name):
+                    os.remove(os.path.join(dirpath, filename))
+                    self.removed += 1
+            for dirname in dirnames:
+                name = rel_dir + dirname
+                path = os.path.join(dirpath, dirname)
+                if name not in self.__installed and not self.is_preserved(name) and not os.path.islink(path) and not os.listdir(path):
+                    os.rmdir(path)
+
+    def swap(self) -> None:
+        old = f"{self.dest_dir}.old"
+        if os.path.isdir(self.dest_dir):
+            for keep in self.preserve:
+                path = os.path.join(self.dest_dir, keep)
+                if os.path.exists(path):
+                    os.rename(path, os.path.join(self.staging, keep))
+                    self.__moved.append((os.path.join(self.staging, keep), path))
+            os.rename(self.dest_dir, old)
+            try:
+                os.rename(self.staging, self.dest_dir)
+            except OSError:
+                os.rename(old, self.dest_dir)
+                raise
+        else:
+            os.rename(self.staging, self.dest_dir)
+        self.__moved = []
+        shutil.rmtree(old, ignore_errors=True)
+
+    def rollback(self) -> None:
+        for target, installed in reversed(self.__moved):
+            try:
+                os.rename(target, installed)
+            except OSError as e:
+                logger.error(f"Не удалось вернуть {installed}: {e}")
+        self.__moved = []
+        shutil.rmtree(self.staging, ignore_errors=True)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+manifest_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "patches.json")
+
+
+def find_line(lines: List[str], anchor: str) -> Optional[int]:
+    for index, line in enumerate(lines):
+        if anchor in line:
+            return index
+    return None
+
+
+class Insert:
+    """Text inserted at offset lines from the first line containing anchor, or from the top"""
+
+    def __init__(self, text: str, anchor: Optional[str] = None, offset: int = 0,
+                 unless: Optional[str] = None, indent: bool = False, required: bool = True):
+        self.text = text
+        self.anchor = anchor
+        self.offset = offset
+        self.unless = unless
+        self.indent = indent
+        self.required = required
+
+    def apply(self, lines: List[str], content: str) -> bool:
+        if self.unless and self.unless in content:
+            return True
+        index = 0
+        text = self.text
+        if self.anchor is not None:
+            index = find_line(lines, self.anchor)
+            if index is None:
+                if self.required:
+                    logger.error(f"Не найдена строка для вставки: {self.anchor}")
+                return not self.required
+            if self.indent:
+                line = lines[index]
+                text = line[:len(line) - len(line.lstrip())] + text
+        lines.insert(index + self.offset, text)
+        return True
+
+
+class Replace:
+    def __init__(self, old: str, new: str):
+        self.old = old
+        self.new = new
+
+    def apply(self, lines: List[str], content: str) -> bool:
+        lines[:] = [line.replace(self.old, self.new) for line in lines]
+        return True
+
+
+class Append:
+    def __init__(self, text: str):
+        self.text = text
+
+    def apply(self, lines: List[str], content: str) -> bool:
+        lines[-1] += self.text
+        return True
+
+
+class Patcher:
+    """Applies lists of edits to text files and remembers what it patched.
+
+    The manifest keeps size, mtime and SHA-256 of every file after patching.
+    A file whose stat matches is skipped without being read; one whose hash
+    still matches only has its stat refreshed. Otherwise the file is read
+    once, skipped if it already carries the marker (patched by an older
+    version), or gets all its edits and one atomic write.
+    """
+
+    def __init__(self, path: str = manifest_path):
+        self.path = path
+        self.__files: Dict[str, dict] = {}
+        self.__loaded = False
+        self.__lock = threading.Lock()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.__files = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info(f"Манифест исправлений не найден: {e}")
+        self.__loaded = True
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.__files, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить манифест исправлений: {e}")
+
+    def apply(self, path: str, marker: str, patches: list) -> bool:
+        """Returns False if a required anchor is missing; the file is then left untouched"""
+        with self.__lock:
+            if not self.__loaded:
+                self.load()
+            st = os.stat(path)
+            record = self.__files.get(path)
+            if record and record["marker"] == marker and record["size"] == st.st_size and record["mtime"] == st.st_mtime_ns:
+                return True
+
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            content = data.decode("utf-8")
+            if not (record and record["marker"] == marker and record["hash"] == digest) and marker not in content:
+                lines = content.split("\n")
+                for patch in patches:
+                    if not patch.apply(lines, content):
+                        return False
+                data = "\n".join(lines).encode("utf-8")
+                digest = hashlib.sha256(data).hexdigest()
+                self.write(path, data)
+                logger.info(f"Исправлен файл {path}")
+                st = os.stat(path)
+
+            self.__files[path] = {"marker": marker, "size": st.st_size, "mtime": st.st_mtime_ns, "hash": digest}
+            self.save()
+            return True
+
+    @staticmethod
+    def write(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+
+
+patcher = Patcher()
@@ -0,0 +1,73 @@
+import filecmp
+import os
+import shlex
+import stat
+import subprocess
+import time
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+class PrivilegedBatch:
+    """Filesystem actions that need root, run by a single sudo call.
+
+    Each action is checked against the current state when it is queued and
+    dropped if there is nothing to do, so a device that is already set up
+    costs no sudo at all. The queued commands run in order under "sh -e",
+    stopping at the first failure like the separate calls used to.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.commands: List[List[str]] = []
+        self.skipped = 0
+
+    def add(self, *command: str) -> None:
+        self.commands.append(list(command))
+
+    def remove(self, path: str) -> None:
+        if os.path.lexists(path):
+            self.add("rm", "-f", path)
+        else:
+            self.skipped += 1
+
+    def symlink(self, target: str, link: str) -> None:
+        if os.path.islink(link) and os.readlink(link) == target:
+            self.skipped += 1
+        else:
+            self.add("ln", "-sf", target, link)
+
+    def copy(self, src: str, dest: str) -> None:
+        try:
+            if filecmp.cmp(src, dest, shallow=False):
+                self.skipped += 1
+                return
+        except OSError:
+            pass
+        self.add("cp", "-f", src, dest)
+
+    def chmod(self, mode: int, path: str) -> None:
+        try:
+            if stat.S_IMODE(os.stat(path).st_mode) == mode:
+                self.skipped += 1
+                return
+        except OSError:
+            pass
+        self.add("chmod", f"{mode:o}", path)
+
+    def run(self) -> bool:
+        started = time.monotonic()
+        if not self.commands:
+            logger.info(f"{self.name}: нет операций, пропущено {self.skipped}")
+            return True
+        script = "\n".join(" ".join(shlex.quote(arg) for arg in command) for command in self.commands)
+        try:
+            subprocess.run(["sudo", "sh", "-e", "-c", script], check=True)
+            return True
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"{self.name}: ошибка выполнения через sudo: {e}")
+            return False
+        finally:
+            logger.info(f"{self.name}: операций {len(self.commands)}, пропущено {self.skipped}, {time.monotonic() - started:.2f} с")
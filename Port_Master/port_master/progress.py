@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class ProgressReporter:
+    """Progress counters written by the work, drawn by the screen thread at a capped rate.
+
+    run() moves the work to a worker thread and keeps the calling thread,
+    which owns the screen, as the renderer: it redraws at most fps times a
+    second, straight away when the phase changes, and only if something
+    changed. The work only updates counters and never waits on a repaint.
+    """
+
+    def __init__(self, render: Callable[["ProgressReporter"], None], fps: int = 10):
+        self.render = render
+        self.interval = 1 / fps
+        self.phase = ""
+        self.done = 0
+        self.total = 0
+        self.label = ""
+        self.__version = 0
+        self.__drawn = -1
+        self.__wake = threading.Event()
+
+    @property
+    def percent(self) -> float:
+        return min(100.0, self.done * 100 / self.total) if self.total > 0 else 0.0
+
+    def update(self, done: int, total: Optional[int] = None, label: Optional[str] = None) -> None:
+        self.done = done
+        if total is not None:
+            self.total = total
+        if label is not None:
+            self.label = label
+        self.__version += 1
+
+    def hook(self, block_num: int, block_size: int, total_size: int, label: Optional[str] = None) -> None:
+        """urlretrieve style reporthook"""
+        self.update(block_num * block_size, total_size, label)
+
+    def set_phase(self, phase: str, total: int = 0) -> None:
+        self.phase = phase
+        self.done = 0
+        self.total = total
+        self.label = ""
+        self.__version += 1
+        self.__wake.set()
+
+    def draw(self) -> None:
+        version = self.__version
+        if version != self.__drawn:
+            self.__drawn = version
+            self.render(self)
+
+    def run(self, work: Callable, *args, **kwargs):
+        """Call work(*args, **kwargs) on a worker thread, drawing from this one; returns or raises its outcome"""
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = work(*args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                self.__wake.set()
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        while True:
+            finished = not thread.is_alive()
+            self.draw()
+            if finished:
+                break
+            self.__wake.wait(self.interval)
+            self.__wake.clear()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "releases.json")
+
+
+class ReleaseCache:
+    """GitHub release JSON kept on the card and revalidated with its ETag.
+
+    A release fetched less than min_age seconds ago is returned without
+    touching the network. Older ones are requested with If-None-Match; a 304
+    answer does not count against the unauthenticated rate limit. When the
+    request fails, the last known release is used if there is one.
+    """
+
+    def __init__(self, path: str = cache_path, min_age: float = 15 * 60):
+        self.path = path
+        self.min_age = min_age
+        self.__entries: Dict[str, dict] = {}
+        self.__loaded = False
+        self.__lock = threading.Lock()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.__entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info(f"Кэш релизов не найден: {e}")
+        self.__loaded = True
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.__entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить кэш релизов: {e}")
+
+    def get(self, url: str, timeout: float = 10, session: Optional[requests.Session] = None) -> dict:
+        with self.__lock:
+            if not self.__loaded:
+                self.load()
+            entry = self.__entries.get(url)
+        if entry and time.time() - entry["checked"] < self.min_age:
+            logger.info(f"Релиз из кэша: {url}")
+            return entry["release"]
+
+        headers = {"Accept": "application/vnd.github+json"}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        try:
+            response = (session or requests).get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and entry:
+                logger.info(f"Релиз не изменился (304): {url}")
+            else:
+                response.raise_for_status()
+                entry = {"etag": response.headers.get("ETag", ""), "release": response.json()}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if not entry:
+                raise
+            logger.warning(f"Ошибка запроса {url}, используется кэш: {e}")
+            return entry["release"]
+
+        entry["checked"] = time.time()
+        with self.__lock:
+            self.__entries[url] = entry
+            self.save()
+        return entry["release"]
+
+
+release_cache = ReleaseCache()
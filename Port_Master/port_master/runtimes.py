@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+manifest_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "runtimes.json")
+HASH_CHUNK = 1024 * 1024
+# Left next to a runtime by an unfinished download, see DownloadTask
+PART_SUFFIXES = (".part.json", ".part")
+
+
+def asset_file(asset: dict) -> str:
+    return os.path.basename(asset["browser_download_url"])
+
+
+class RuntimeSync:
+    """Keeps libs in step with the runtimes release.
+
+    The manifest stores, for every runtime we installed, the release asset
+    id, size, updated_at and digest, plus the size and mtime the file had
+    when it was last known good. plan() compares that with the release to
+    find what to fetch and what to delete; a runtime replaced under the same
+    name or truncated on the card is fetched again. verify() hashes only
+    files whose size or mtime moved since they were last checked.
+    """
+
+    def __init__(self, libs_dir: str, path: str = manifest_path):
+        self.libs_dir = libs_dir
+        self.path = path
+        self.__entries: Dict[str, dict] = {}
+        self.__loaded = False
+        self.__lock = threading.RLock()
+        self.__thread: Optional[threading.Thread] = None
+        # Runtimes the last verify() found corrupt, for a re-fetch in the same session
+        self.damaged: List[str] = []
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.__entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info(f"Манифест рантаймов не найден: {e}")
+        self.__loaded = True
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.__entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить манифест рантаймов: {e}")
+
+    def plan(self, assets: List[dict]) -> Tuple[List[dict], List[str]]:
+        """Assets to download and file names to delete to match the release"""
+        with self.__lock:
+            if not self.__loaded:
+                self.load()
+            fetch = []
+            adopted = False
+            for asset in assets:
+                name = asset_file(asset)
+                try:
+                    st = os.stat(os.path.join(self.libs_dir, name))
+                except OSError:
+                    fetch.append(asset)
+                    continue
+                entry = self.__entries.get(name)
+                if entry is None and st.st_size == asset.get("size"):
+                    # Installed before the manifest existed and accepted by size as
+                    # before; verify() only hashes it once it changes on the card
+                    self.__entries[name] = self.entry(asset, st.st_mtime_ns)
+                    adopted = True
+                elif entry is None or entry.get("corrupt") or not self.matches(entry, asset) or st.st_size != entry["size"]:
+                    fetch.append(asset)
+            if adopted:
+                self.save()
+
+            names = {asset_file(asset) for asset in assets}
+            delete = [name for name in self.__entries if name not in names]
+        self.remove_orphans({asset_file(asset) for asset in fetch})
+        return fetch, delete
+
+    def remove_orphans(self, pending: set) -> None:
+        """Delete partial downloads left by a cancel or failed install, except those still to be continued"""
+        try:
+            names = os.listdir(self.libs_dir)
+        except OSError:
+            return
+        for name in names:
+            base = next((name[:-len(suffix)] for suffix in PART_SUFFIXES if name.endswith(suffix)), None)
+            if base is None or base in pending:
+                continue
+            try:
+                os.remove(os.path.join(self.libs_dir, name))
+                logger.info(f"Удалена брошенная загрузка {name}")
+            except OSError as e:
+                logger.error(f"Не удалось удалить {name}: {e}")
+
+    @staticmethod
+    def matches(entry: dict, asset: dict) -> bool:
+        return (entry["id"], entry["size"], entry["updated_at"]) == (asset.get("id"), asset.get("size"), asset.get("updated_at"))
+
+    @staticmethod
+    def entry(asset: dict, mtime: Optional[int]) -> dict:
+        return {
+            "id": asset.get("id"),
+            "size": asset.get("size"),
+            "updated_at": asset.get("updated_at"),
+            "digest": asset.get("digest") or "",
+            # mtime of the file when its content was last confirmed
+            "verified": mtime,
+        }
+
+    def record(self, asset: dict) -> None:
+        """Called once a downloaded (and already verified) runtime is in place"""
+        name = asset_file(asset)
+        with self.__lock:
+            self.__entries[name] = self.entry(asset, os.stat(os.path.join(self.libs_dir, name)).st_mtime_ns)
+            self.save()
+
+    def remove(self, name: str) -> None:
+        path = os.path.join(self.libs_dir, name)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info(f"Удалён устаревший рантайм {name}")
+        except OSError as e:
+            logger.error(f"Не удалось удалить {name}: {e}")
+            return
+        with self.__lock:
+            self.__entries.pop(name, None)
+            self.save()
+
+    def verify_in_background(self) -> None:
+        if not self.verifying():
+            self.__thread = threading.Thread(target=self.verify, daemon=True)
+            self.__thread.start()
+
+    def verifying(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def wait(self) -> None:
+        """Let a background verify() finish; exec would otherwise cut it off every launch"""
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def verify(self) -> None:
+        with self.__lock:
+            if not self.__loaded:
+                self.load()
+            names = list(self.__entries)
+        checked = 0
+        damaged = []
+        for name in names:
+            with self.__lock:
+                entry = self.__entries.get(name)
+            path = os.path.join(self.libs_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if entry is None or entry.get("corrupt") or (st.st_size == entry["size"] and st.st_mtime_ns == entry["verified"]):
+                continue
+
+            good = st.st_size == entry["size"]
+            algorithm, _, expected = entry["digest"].partition(":")
+            if good and algorithm:
+                hasher = hashlib.new(algorithm)
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                        hasher.update(chunk)
+                good = hasher.hexdigest() == expected
+            checked += 1
+
+            with self.__lock:
+                if good:
+                    entry["verified"] = st.st_mtime_ns
+                else:
+                    # The next plan() fetches it again
+                    logger.warning(f"Рантайм {name} повреждён")
+                    entry["corrupt"] = True
+                    damaged.append(name)
+                self.save()
+        self.damaged = damaged
+        logger.info(f"Проверка рантаймов завершена, проверено файлов: {checked}")
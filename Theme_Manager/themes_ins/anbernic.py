@@ -1,4 +1,4 @@
-from pathlib import Path
+from storage import storage_state
 
 
 class Anbernic:
@@ -12,14 +12,14 @@ class Anbernic:
         return self.__current_sd
 
     def get_sd_storage_path(self):
-        if self.__current_sd == 1 or not any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 1 or not storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 1
             return self.__sd1_rom_storage_path
         else:
             return self.__sd2_rom_storage_path
 
     def switch_sd_storage(self):
-        if self.__current_sd == 1 and any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 1 and storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 2
         else:
             self.__current_sd = 1
@@ -0,0 +1,76 @@
+import os
+import select
+from typing import Dict, Optional, Set
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+
+
+class StorageState:
+    """Mounted/populated state of the SD card slots, cached between mount changes.
+
+    /proc/self/mountinfo is parsed once and kept open; the kernel flags the fd
+    with POLLPRI/POLLERR whenever the mount table changes, so a zero-timeout
+    poll() is all that is needed per call instead of touching the card. A
+    slot is present when its mount point is in the table; the card is only
+    read to tell an empty one apart, once per mount change.
+    """
+
+    def __init__(self):
+        self.__mounts: Set[str] = set()
+        self.__populated: Dict[str, bool] = {}
+        self.__file = None
+        self.__poller: Optional[select.poll] = None
+        try:
+            self.__file = open(MOUNTINFO_PATH, "rb")
+            self.__poller = select.poll()
+            self.__poller.register(self.__file.fileno(), select.POLLPRI | select.POLLERR)
+            self.__read_mounts()
+        except (OSError, AttributeError) as e:
+            print(f"Mount table unavailable, checking storage on every call: {e}")
+            self.__file = None
+            self.__poller = None
+
+    def __read_mounts(self) -> None:
+        # Reading the table to the end also re-arms the change notification
+        self.__file.seek(0)
+        mounts = set()
+        for line in self.__file.read().decode(errors="replace").splitlines():
+            fields = line.split(" ")
+            if len(fields) > 4:
+                # Mount points escape spaces and tabs as octal sequences
+                mounts.add(fields[4].replace("\\040", " ").replace("\\011", "\t"))
+        self.__mounts = mounts
+        self.__populated.clear()
+
+    def poll(self) -> bool:
+        """Refresh the cache if the mount table changed, True when it did"""
+        if not self.__poller:
+            return True
+        if self.__poller.poll(0):
+            print("Mount table changed, refreshing storage state")
+            self.__read_mounts()
+            return True
+        return False
+
+    def is_mounted(self, path: str) -> bool:
+        """Whether a filesystem is mounted on path, from the mount table alone"""
+        if not self.__poller:
+            return os.path.ismount(path)
+        self.poll()
+        return os.path.normpath(path) in self.__mounts
+
+    def is_populated(self, path: str) -> bool:
+        """Whether a card is mounted on path and has any entry, read again only after a mount change"""
+        changed = self.poll()
+        if not self.is_mounted(path):
+            return False
+        if changed or path not in self.__populated:
+            try:
+                with os.scandir(path) as entries:
+                    self.__populated[path] = next(entries, None) is not None
+            except OSError:
+                self.__populated[path] = False
+        return self.__populated[path]
+
+
+storage_state = StorageState()
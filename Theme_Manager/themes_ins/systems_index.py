@@ -0,0 +1,128 @@
+import os
+import ctypes
+import struct
+from typing import Dict, List, Optional, Set
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_WATCH_MASK = (
+    0x00000100  # IN_CREATE
+    | 0x00000200  # IN_DELETE
+    | 0x00000040  # IN_MOVED_FROM
+    | 0x00000080  # IN_MOVED_TO
+    | 0x00000400  # IN_DELETE_SELF
+    | 0x00000800  # IN_MOVE_SELF
+    | 0x00002000  # IN_UNMOUNT
+)
+IN_Q_OVERFLOW = 0x00004000
+# Reported instead of a watch when the event queue overflowed and events were lost
+OVERFLOW_WD = -1
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal non-blocking inotify wrapper over libc, no extra module needed"""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        return self.libc.inotify_add_watch(self.fd, os.fsencode(path), IN_WATCH_MASK)
+
+    def rm_watch(self, wd: int) -> None:
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_changed(self) -> Set[int]:
+        """Watch descriptors with pending events, empty when nothing changed; OVERFLOW_WD if events were lost"""
+        changed: Set[int] = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(buffer):
+                wd, mask, _, name_len = EVENT_HEADER.unpack_from(buffer, offset)
+                changed.add(OVERFLOW_WD if mask & IN_Q_OVERFLOW else wd)
+                offset += EVENT_HEADER.size + name_len
+
+
+class SystemIndex:
+    """Which system folders under a storage root are present and not empty.
+
+    Each root is read once with os.scandir and kept in memory. It is rebuilt
+    when an inotify watch on the root or one of its system folders fires, or,
+    where inotify is unavailable, when the root directory mtime changes.
+    """
+
+    def __init__(self):
+        self.__roots: Dict[str, dict] = {}
+        try:
+            self.__inotify: Optional[Inotify] = Inotify()
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable, using directory mtime only: {e}")
+            self.__inotify = None
+
+    def invalidate(self, roms_path: Optional[str] = None) -> None:
+        for root in [roms_path] if roms_path else list(self.__roots):
+            entry = self.__roots.pop(root, None)
+            if entry and self.__inotify:
+                for wd in entry["watches"]:
+                    self.__inotify.rm_watch(wd)
+
+    def get_available_systems(self, roms_path: str, system_names: List[str]) -> List[str]:
+        if self.__inotify:
+            changed = self.__inotify.read_changed()
+            if OVERFLOW_WD in changed:
+                # Lost events could concern any root
+                self.invalidate()
+            elif changed:
+                for root, entry in list(self.__roots.items()):
+                    if changed & entry["watches"]:
+                        self.invalidate(root)
+
+        try:
+            mtime = os.stat(roms_path).st_mtime_ns
+        except OSError:
+            self.invalidate(roms_path)
+            return []
+
+        entry = self.__roots.get(roms_path)
+        if entry is None or entry["mtime"] != mtime:
+            self.invalidate(roms_path)
+            entry = self.build(roms_path, mtime)
+            self.__roots[roms_path] = entry
+
+        folders = entry["folders"]
+        return [name for name in system_names if name in folders]
+
+    def build(self, roms_path: str, mtime: int) -> dict:
+        folders: Set[str] = set()
+        watches: Set[int] = set()
+        if self.__inotify:
+            watches.add(self.__inotify.add_watch(roms_path))
+        try:
+            with os.scandir(roms_path) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        continue
+                    if self.__inotify:
+                        # Emptiness of a system folder changes without touching the root
+                        watches.add(self.__inotify.add_watch(entry.path))
+                    try:
+                        with os.scandir(entry.path) as children:
+                            if next(children, None) is not None:
+                                folders.add(entry.name)
+                    except OSError as e:
+                        print(f"Error reading {entry.path}: {e}")
+        except OSError as e:
+            print(f"Error indexing systems in {roms_path}: {e}")
+        watches.discard(-1)
+        print(f"Indexed {len(folders)} system folders in {roms_path}")
+        return {"mtime": mtime, "folders": folders, "watches": watches}
+
+
+system_index = SystemIndex()
@@ -1,5 +1,5 @@
 import os
-from pathlib import Path
+from storage import storage_state
 
 
 class Anbernic:
@@ -46,7 +46,7 @@ class Anbernic:
             self.__current_sd = 1
     
     def get_sd_storage_path(self):
-        if self.__current_sd == 1 or not any(Path("/mnt/sdcard").iterdir()):
+        if self.__current_sd == 1 or not storage_state.is_populated("/mnt/sdcard"):
             self.__current_sd = 1
             return self.get_sd1_storage_path()
         else:
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 from main import hw_info, system_lang
 from graphic import screen_resolutions, UserInterface
 from language import Translator
@@ -8,10 +8,9 @@ import sys
 import time
 import socket
 from anbernic import Anbernic
-from scraper import Scraper
+from scraper import Rom, Scraper
 from systems import get_system_id
-from PIL import Image
-from io import BytesIO
+from encoder import encode_image, get_output_profile
 
 ver="v1.2"
 translator = Translator(system_lang)
@@ -23,6 +22,7 @@ an = Anbernic()
 scraper = Scraper()
 gr = UserInterface()
 skip_input_check = False
+output_profile = None
 
 x_size, y_size, max_elem = screen_resolutions.get(hw_info, (640, 480, 11))
 
@@ -48,15 +48,18 @@ def is_connected():
 
 
 def start(config_path: str) -> None:
+    global output_profile
+
     print("Starting Tiny Scraper...")
-    if not is_connected():
+    scraper.load_config_from_json(config_path)
+    output_profile = get_output_profile(scraper.output_profile, hw_info, scraper.output_colors)
+    if not scraper.offline and not is_connected():
         gr.draw_log(
             f"{translator.translate('No internet connection')}", fill=gr.colorBlue, outline=gr.colorBlueD1
         )
         gr.draw_paint()
         time.sleep(3)
         sys.exit(1)
-    scraper.load_config_from_json(config_path)
     load_console_menu()
 
 
@@ -190,26 +193,12 @@ def load_roms_menu() -> None:
         gr.draw_log(f"{translator.translate('Scraping...')}", fill=gr.colorBlue, outline=gr.colorBlueD1)
         gr.draw_paint()
         rom = roms_without_image[roms_selected_position]
-        rom_path = system_path / rom.filename
-        imgs_folder = rom_path.parent / "Imgs"
-        if not imgs_folder.exists():
-            imgs_folder.mkdir(parents=True, exist_ok=True)
-        rom.set_crc(scraper.get_crc32_from_file(rom_path))
-        screenshot = scraper.scrape_screenshot(
-            game_name=rom.name, crc=rom.crc, system_id=system_id, system_name=selected_system
-        )
-        if screenshot:
-            # For PORTS, we need to remove the .sh extension for the image name
-            image_name = rom.name[:-3] if selected_system == "PORTS" and rom.name.endswith(".sh") else rom.name
-            img_path = imgs_folder / f"{image_name}.png"
-            save_screenshot(img_path, screenshot)
+        if scrape_rom(rom, system_path, system_id):
             gr.draw_log(
                 f"{translator.translate('Scraping completed')}", fill=gr.colorBlue, outline=gr.colorBlueD1
             )
-            print(f"Done scraping {rom.name}. Saved file to {img_path}")
         else:
             gr.draw_log(f"{translator.translate('Scraping failed!')}", fill=gr.colorBlue, outline=gr.colorBlueD1)
-            print(f"Failed to get screenshot for {rom.name}")
         gr.draw_paint()
         time.sleep(3)
         exit_menu = True
@@ -225,23 +214,9 @@ def load_roms_menu() -> None:
         gr.draw_paint()
         for rom in roms_without_image:
             if rom.name not in imgs_files:
-                rom_path = system_path / rom.filename
-                imgs_folder = rom_path.parent / "Imgs"
-                if not imgs_folder.exists():
-                    imgs_folder.mkdir(parents=True, exist_ok=True)
-                rom.set_crc(scraper.get_crc32_from_file(rom_path))
-                screenshot: Optional[bytes] = scraper.scrape_screenshot(
-                    game_name=rom.name, crc=rom.crc, system_id=system_id, system_name=selected_system
-                )
-                if screenshot:
-                    # For PORTS, we need to remove the .sh extension for the image name
-                    image_name = rom.name[:-3] if selected_system == "PORTS" and rom.name.endswith(".sh") else rom.name
-                    img_path = imgs_folder / f"{image_name}.png"
-                    save_screenshot(img_path, screenshot)
-                    print(f"Done scraping {rom.name}. Saved file to {img_path}")
+                if scrape_rom(rom, system_path, system_id):
                     success += 1
                 else:
-                    print(f"Failed to get screenshot for {rom.name}")
                     failure += 1
                 progress += 1
                 gr.draw_log(
@@ -311,12 +286,61 @@ def load_roms_menu() -> None:
 
     gr.draw_paint()
 
-def save_screenshot(img_path: Path, screenshot: bytes) -> None:
-    if scraper.resize:
-        print("Resizing image...")
-        img = Image.open(BytesIO(screenshot))
-        target_size = (320, 240)
-        img = img.resize(target_size, Image.LANCZOS)
-        img.save(img_path)
+def scrape_rom(rom: Rom, system_path: Path, system_id: int) -> bool:
+    scraper.set_media_store(an.get_sd_storage_path())
+    rom_path = system_path / rom.filename
+    imgs_folder = rom_path.parent / "Imgs"
+    if not imgs_folder.exists():
+        imgs_folder.mkdir(parents=True, exist_ok=True)
+    rom.set_crc(scraper.get_crc32_from_file(rom_path))
+    # For PORTS, we need to remove the .sh extension for the image name
+    image_name = rom.name[:-3] if selected_system == "PORTS" and rom.name.endswith(".sh") else rom.name
+
+    if selected_system == "PORTS" or not scraper.extra_media_types:
+        medias: Dict[str, bytes] = {}
+        screenshot: Optional[bytes] = scraper.scrape_screenshot(
+            game_name=rom.name, crc=rom.crc, system_id=system_id, system_name=selected_system
+        )
+        if screenshot:
+            medias[scraper.media_type] = screenshot
     else:
-        img_path.write_bytes(screenshot)
+        # One game info lookup serves the main media and every extra media type
+        medias = scraper.scrape_medias(
+            rom.crc, rom.name, system_id, [scraper.media_type] + scraper.extra_media_types, selected_system
+        )
+
+    for media_type in scraper.extra_media_types:
+        if media_type in medias:
+            media_folder = imgs_folder / media_type
+            media_folder.mkdir(parents=True, exist_ok=True)
+            save_screenshot(media_folder / f"{image_name}.png", medias[media_type])
+
+    screenshot = medias.get(scraper.media_type)
+    if not screenshot:
+        print(f"Failed to get screenshot for {rom.name}")
+        return False
+    img_path = imgs_folder / f"{image_name}.png"
+    save_screenshot(img_path, screenshot)
+    print(f"Done scraping {rom.name}. Saved file to {img_path}")
+    return True
+
+
+def encode_screenshot(screenshot: bytes) -> bytes:
+    if not output_profile:
+        return screenshot
+    print(f"Encoding image for profile {output_profile['name']}...")
+    return encode_image(screenshot, output_profile)
+
+
+def save_screenshot(img_path: Path, screenshot: bytes) -> None:
+    store = scraper.store
+    if store is None:
+        img_path.write_bytes(encode_screenshot(screenshot))
+        return
+
+    # Variants of the same game share one stored image, only encoded once
+    key = store.add(screenshot)
+    data: Optional[bytes] = screenshot
+    if output_profile:
+        key, data = store.add_variant(key, output_profile["name"], lambda: encode_screenshot(screenshot))
+    store.materialize(key, img_path, data)
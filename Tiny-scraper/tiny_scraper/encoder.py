@@ -0,0 +1,73 @@
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+# Artwork box per hw_info, about half of the screen like the stock frontend preview
+device_boxes = {
+    1: (360, 360),  # 720x720
+    2: (360, 240),  # 720x480
+}
+default_box = (320, 240)  # 640x480
+# What "resize": true has always produced: stretched to this size, aspect ratio ignored
+stretch_box = (320, 240)
+
+
+def get_output_profile(name: str, hw_info: int, colors: int = 0) -> Optional[Dict[str, Any]]:
+    """Resolve an output profile name, None means the downloaded file is kept as is.
+
+    name is "original", "auto" for the device box, "stretch" for the old
+    fixed 320x240 resize, or an explicit "WIDTHxHEIGHT".
+    colors > 0 quantizes to a paletted PNG with that many colors.
+    """
+    if not name or name == "original":
+        return None
+    stretch = name == "stretch"
+    if stretch:
+        box = stretch_box
+    elif name == "auto":
+        box = device_boxes.get(hw_info, default_box)
+    else:
+        try:
+            width, height = (int(v) for v in name.lower().split("x"))
+            box = (width, height)
+        except ValueError:
+            print(f"Invalid output profile {name}, keeping original images")
+            return None
+    try:
+        colors = max(0, min(int(colors or 0), 256))
+    except (TypeError, ValueError):
+        print(f"Invalid output_colors {colors}, images are not quantized")
+        colors = 0
+    profile_name = ("stretch-" if stretch else "") + f"{box[0]}x{box[1]}" + (f"-p{colors}" if colors else "")
+    return {"name": profile_name, "box": box, "colors": colors, "stretch": stretch}
+
+
+def fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest size keeping the aspect ratio that fits the box, never upscaling"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def encode_image(data: bytes, profile: Dict[str, Any]) -> bytes:
+    img = Image.open(BytesIO(data))
+    img.load()
+    target = profile["box"] if profile.get("stretch") else fit_size(img.size, profile["box"])
+
+    if target != img.size:
+        # Cheap integer box reduce first, keep at least 2x for the final LANCZOS pass
+        factor = min(img.width // target[0], img.height // target[1]) // 2
+        if factor >= 2:
+            img = img.reduce(factor)
+        img = img.resize(target, Image.LANCZOS)
+
+    if img.mode not in ("RGB", "RGBA", "P", "L"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    if profile["colors"] and img.mode != "P":
+        # Fast octree keeps alpha, median cut would need RGB
+        img = img.quantize(colors=profile["colors"], method=Image.FASTOCTREE)
+
+    output = BytesIO()
+    img.save(output, format="PNG", optimize=True)
+    return output.getvalue()
@@ -2,12 +2,16 @@ import os
 import binascii
 import json
 import base64
+import gzip
 from pathlib import Path
 import ssl
 from urllib.request import urlopen, Request
 import urllib.parse
 from systems import get_system_extension, systems
-from typing import Dict, Any, Optional
+from systems_index import system_index
+from sources import LocalPackSource, MediaSource
+from store import MediaStore
+from typing import Dict, Any, List, Optional
 
 
 class Rom:
@@ -29,7 +33,22 @@ class Scraper:
         self.media_type = "ss"
         self.region = "wor"
         self.resize = False
+        self.output_profile = "original"
+        self.output_colors = 0
+        self.extra_media_types: List[str] = []
+        self.media_sources: List[MediaSource] = []
+        self.offline = False
+        self.use_media_store = True
+        self.store: Optional[MediaStore] = None
+        self.__stores: Dict[str, MediaStore] = {}
+        self.api_url = "https://api.screenscraper.fr/api2"
+        self.ports_url = "https://raw.githubusercontent.com/PortsMaster/PortMaster-Info/main"
         self.ports_data: Optional[Dict[str, Any]] = None
+        self.cache_dir = Path(os.path.dirname(os.path.abspath(__file__))) / "cache"
+        # Building a context loads the CA store, far too slow to repeat per request
+        self.ssl_context = ssl.create_default_context()
+        self.ssl_context.check_hostname = False
+        self.ssl_context.verify_mode = ssl.CERT_NONE
 
     def load_config_from_json(self, filepath) -> bool:
         if not os.path.exists(filepath):
@@ -43,21 +62,46 @@ class Scraper:
             self.media_type = config.get("media_type") or "ss"
             self.region = config.get("region") or "wor"
             self.resize = config.get("resize") is True
+            # "resize": true predates output profiles and keeps its fixed 320x240 stretch
+            self.output_profile = config.get("output_profile") or ("stretch" if self.resize else "original")
+            self.output_colors = config.get("output_colors") or 0
+            self.extra_media_types = [
+                media_type
+                for media_type in config.get("extra_media_types") or []
+                if media_type != self.media_type
+            ]
+            local_packs = config.get("local_packs") or []
+            if isinstance(local_packs, str):
+                local_packs = [local_packs]
+            self.media_sources = [
+                LocalPackSource(pack_path, self.cache_dir) for pack_path in local_packs
+            ]
+            self.offline = config.get("offline") is True
+            self.use_media_store = config.get("media_store") is not False
+            self.api_url = (config.get("api_url") or self.api_url).rstrip("/")
+            self.ports_url = (config.get("ports_url") or self.ports_url).rstrip("/")
         return True
 
+    def set_media_store(self, roms_path: str) -> Optional[MediaStore]:
+        """Select the media store of a storage root, kept on the same card as its Imgs"""
+        if not self.use_media_store:
+            self.store = None
+        else:
+            if roms_path not in self.__stores:
+                self.__stores[roms_path] = MediaStore(Path(roms_path) / ".media_store")
+            self.store = self.__stores[roms_path]
+        return self.store
+
     def load_ports_data(self) -> bool:
         """Load ports data from PortsMaster JSON"""
         if self.ports_data is not None:
             return True
             
-        ports_url = "https://raw.githubusercontent.com/PortsMaster/PortMaster-Info/main/ports.json"
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
+        ports_url = f"{self.ports_url}/ports.json"
         
         try:
             request = Request(ports_url)
-            with urlopen(request, context=ctx) as response:
+            with urlopen(request, context=self.ssl_context) as response:
                 if response.status == 200:
                     data = json.loads(response.read())
                     self.ports_data = data.get("ports", {})
@@ -99,23 +143,26 @@ class Scraper:
         if screenshot:
             # Construct the full URL for the screenshot
             # Screenshots are stored in the main repository under images/
-            return f"https://raw.githubusercontent.com/PortsMaster/PortMaster-Info/main/images/{port_info.get('name', '').replace('.zip', '')}/{screenshot}"
+            return f"{self.ports_url}/images/{port_info.get('name', '').replace('.zip', '')}/{screenshot}"
         return None
 
     def download_port_screenshot(self, screenshot_url):
         """Download screenshot for a port"""
         if not screenshot_url:
             return None
+        if self.store and (screenshot := self.store.read_url(screenshot_url)):
+            print("Port screenshot already stored, skipping download")
+            return screenshot
             
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
         
         try:
             request = Request(screenshot_url)
-            with urlopen(request, context=ctx) as response:
+            with urlopen(request, context=self.ssl_context) as response:
                 if response.status == 200:
-                    return response.read()
+                    screenshot = response.read()
+                    if self.store:
+                        self.store.add(screenshot, screenshot_url)
+                    return screenshot
         except Exception as e:
             print(f"Error downloading port screenshot: {e}")
         return None
@@ -175,20 +222,16 @@ class Scraper:
         return roms
 
     def get_available_systems(self, roms_path: str) -> list[str]:
-        all_systems = [system["name"] for system in systems]
-        available_systems = []
-        for system in all_systems:
-            system_path = Path(roms_path) / system
-            if system_path.exists() and any(system_path.iterdir()):
-                available_systems.append(system)
-
-        return available_systems
+        return system_index.get_available_systems(roms_path, [system["name"] for system in systems])
 
     def scrape_screenshot(
         self, crc: str, game_name: str, system_id: int, system_name: str = ""
     ) -> bytes | None:
         # Special handling for PORTS system
         if system_name == "PORTS":
+            medias = self.get_local_medias(system_name, crc, game_name, [self.media_type])
+            if self.media_type in medias or self.offline:
+                return medias.get(self.media_type)
             print(f"Scraping screenshot for port {game_name}...")
             port_info = self.get_port_info(game_name)  # game_name is the .sh filename for ports
             if not port_info:
@@ -210,54 +253,149 @@ class Scraper:
                 return None
 
         # Regular handling for other systems
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
+        return self.scrape_medias(
+            crc, game_name, system_id, [self.media_type], system_name
+        ).get(self.media_type)
+
+    def get_game_info_cache_path(self, crc: str, system_id: int) -> Path:
+        return self.cache_dir / "jeuinfos" / str(system_id) / f"{crc.upper()}.json.gz"
+
+    def load_cached_game_info(self, crc: str, system_id: int) -> Optional[Dict[str, Any]]:
+        """Load a cached jeuInfos response, None if missing or unreadable"""
+        cache_path = self.get_game_info_cache_path(crc, system_id)
+        if not cache_path.exists():
+            return None
+        try:
+            data = json.loads(gzip.decompress(cache_path.read_bytes()))
+            return data.get("response").get("jeu")
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Discarding corrupt game info cache {cache_path}: {e}")
+            cache_path.unlink(missing_ok=True)
+            return None
+
+    def save_game_info_cache(self, crc: str, system_id: int, raw: bytes) -> None:
+        """Store the raw jeuInfos JSON compressed, written atomically"""
+        cache_path = self.get_game_info_cache_path(crc, system_id)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            tmp_path.write_bytes(gzip.compress(raw, compresslevel=6))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Error writing game info cache {cache_path}: {e}")
+
+    def fetch_game_info(
+        self, crc: str, game_name: str, system_id: int
+    ) -> Optional[Dict[str, Any]]:
+        """Return the jeuInfos game data, from the disk cache when possible"""
+        if crc:
+            game_data = self.load_cached_game_info(crc, system_id)
+            if game_data:
+                print(f"Using cached game info for {game_name}")
+                return game_data
+        if self.offline:
+            return None
 
         decoded_devid = base64.b64decode(self.devid).decode()
         decoded_devpassword = base64.b64decode(self.devpassword).decode()
         encoded_game_name = urllib.parse.quote(game_name)
-        url = f"https://api.screenscraper.fr/api2/jeuInfos.php?devid={decoded_devid}&devpassword={decoded_devpassword}&softname=tiny-scraper&output=json&ssid={self.user}&sspassword={self.password}&crc={crc}&systemeid={system_id}&romtype=rom&romnom={encoded_game_name}"
+        url = f"{self.api_url}/jeuInfos.php?devid={decoded_devid}&devpassword={decoded_devpassword}&softname=tiny-scraper&output=json&ssid={self.user}&sspassword={self.password}&crc={crc}&systemeid={system_id}&romtype=rom&romnom={encoded_game_name}"
 
-        print(f"Scraping screenshot for {game_name}...")
+        print(f"Scraping game info for {game_name}...")
         request = Request(url)
         try:
-            with urlopen(request, context=ctx) as response:
-                if response.status == 200:
-                    try:
-                        data = json.loads(response.read())
-                        game_data = data.get("response").get("jeu")
-
-                        screenshot_url = ""
-                        for media in game_data.get("medias"):
-                            if media["type"] == self.media_type:
-                                if media["region"] == self.region:
-                                    screenshot_url = media["url"]
-                                    break
-                                elif (
-                                    not screenshot_url
-                                ):  # Keep the first one as fallback
-                                    print(f"No media found for this region {self.region} and type {self.media_type} combination for {game_name}")
-                                    screenshot_url = media["url"]
-
-                        if screenshot_url:
-                            img_request = Request(screenshot_url)
-                            with urlopen(img_request, context=ctx) as img_response:
-                                if (
-                                    img_response.headers.get("Content-Type")
-                                    == "image/png"
-                                ):
-                                    return img_response.read()
-                                else:
-                                    print(f"Invalid image format for {game_name}")
-                        else:
-                            print(f"No screenshot URL found for {game_name}")
-                    except ValueError:
-                        print(f"Invalid JSON response for {game_name}")
-                else:
-                    print(f"Failed to get screenshot for {game_name}")
-            return None
+            with urlopen(request, context=self.ssl_context) as response:
+                if response.status != 200:
+                    print(f"Failed to get game info for {game_name}")
+                    return None
+                raw = response.read()
         except Exception as e:
-            print(f"Error scraping screenshot for {game_name}: {e}")
+            print(f"Error scraping game info for {game_name}: {e}")
             print(f"URL used: {url}")
-            return None
\ No newline at end of file
+            return None
+
+        try:
+            game_data = json.loads(raw).get("response").get("jeu")
+        except (ValueError, AttributeError):
+            print(f"Invalid JSON response for {game_name}")
+            return None
+
+        if game_data and crc:
+            self.save_game_info_cache(crc, system_id, raw)
+        return game_data
+
+    def get_media_url(self, game_data: Dict[str, Any], media_type: str) -> str:
+        """Pick the media URL for the configured region, falling back to the first match"""
+        media_url = ""
+        for media in game_data.get("medias") or []:
+            if media.get("type") == media_type:
+                if media.get("region") == self.region:
+                    return media["url"]
+                elif not media_url:  # Keep the first one as fallback
+                    media_url = media["url"]
+        if media_url:
+            print(f"No media found for region {self.region} and type {media_type}, using fallback")
+        return media_url
+
+    def download_media(self, media_url: str, game_name: str) -> bytes | None:
+        if self.store and (media := self.store.read_url(media_url)):
+            print(f"Media for {game_name} already stored, skipping download")
+            return media
+        if self.offline:
+            return None
+
+        try:
+            with urlopen(Request(media_url), context=self.ssl_context) as img_response:
+                if img_response.headers.get("Content-Type") == "image/png":
+                    media = img_response.read()
+                    if self.store:
+                        self.store.add(media, media_url)
+                    return media
+                print(f"Invalid image format for {game_name}")
+        except Exception as e:
+            print(f"Error downloading media for {game_name}: {e}")
+        return None
+
+    def get_local_medias(
+        self, system_name: str, crc: str, game_name: str, media_types: List[str]
+    ) -> Dict[str, bytes]:
+        """Ask each configured media source in order for the missing media types"""
+        medias: Dict[str, bytes] = {}
+        for source in self.media_sources:
+            missing = [media_type for media_type in media_types if media_type not in medias]
+            if not missing:
+                break
+            found = source.get_medias(system_name, crc, game_name, missing)
+            if found:
+                print(f"Found {', '.join(found)} for {game_name} in {source.name} source")
+                medias.update(found)
+        return medias
+
+    def scrape_medias(
+        self,
+        crc: str,
+        game_name: str,
+        system_id: int,
+        media_types: List[str],
+        system_name: str = "",
+    ) -> Dict[str, bytes]:
+        """Collect every requested media type, from local sources first and then
+        from a single game info lookup"""
+        medias = self.get_local_medias(system_name, crc, game_name, media_types)
+        missing = [media_type for media_type in media_types if media_type not in medias]
+        if not missing:
+            return medias
+
+        game_data = self.fetch_game_info(crc, game_name, system_id)
+        if not game_data:
+            return medias
+
+        for media_type in missing:
+            media_url = self.get_media_url(game_data, media_type)
+            if not media_url:
+                print(f"No {media_type} URL found for {game_name}")
+                continue
+            media = self.download_media(media_url, game_name)
+            if media:
+                medias[media_type] = media
+        return medias
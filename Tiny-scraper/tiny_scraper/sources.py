@@ -0,0 +1,205 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import tarfile
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Only PNG artwork, same as what is accepted from ScreenScraper
+IMAGE_EXTENSIONS = (".png",)
+
+# libretro-thumbnails folder names mapped to ScreenScraper media types
+LIBRETRO_MEDIA_FOLDERS = {
+    "named_snaps": "ss",
+    "named_titles": "sstitle",
+    "named_boxarts": "box-2D",
+    "named_logos": "wheel",
+}
+
+INDEX_VERSION = 1
+
+_CRC_PATTERN = re.compile(r"^[0-9A-Fa-f]{8}$")
+_TAGS_PATTERN = re.compile(r"\s*[\(\[][^\)\]]*[\)\]]")
+_NON_ALNUM_PATTERN = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case a game name and drop region/revision tags and punctuation"""
+    name = _TAGS_PATTERN.sub("", name).lower()
+    return _NON_ALNUM_PATTERN.sub("", name)
+
+
+class MediaSource:
+    """Base class for artwork providers queried by Scraper before the network"""
+
+    name = "base"
+
+    def get_medias(
+        self, system_name: str, crc: str, game_name: str, media_types: List[str]
+    ) -> Dict[str, bytes]:
+        return {}
+
+
+class LocalPackSource(MediaSource):
+    """Artwork pack on the SD card or a mounted mirror, as a directory or tarball.
+
+    Expected layout is <pack>/<SYSTEM>/<media>/<file>.png where SYSTEM is the
+    Roms folder name, media is a ScreenScraper media type (ss, box-2D, wheel...)
+    or a libretro-thumbnails folder (Named_Snaps, Named_Boxarts...), and file is
+    either the ROM CRC32 or the game name.
+    """
+
+    name = "local"
+
+    def __init__(self, pack_path: str, cache_dir: Path):
+        self.pack_path = Path(pack_path)
+        self.cache_dir = cache_dir
+        self.index: Dict[str, Dict[str, Union[str, List[int]]]] = {}
+        self.__tar: Optional[tarfile.TarFile] = None
+        self.__loaded = False
+
+    def is_tarball(self) -> bool:
+        return self.pack_path.is_file() and tarfile.is_tarfile(self.pack_path)
+
+    def is_plain_tar(self) -> bool:
+        return self.pack_path.suffix.lower() == ".tar"
+
+    def get_index_path(self) -> Path:
+        digest = hashlib.sha1(str(self.pack_path.resolve()).encode()).hexdigest()[:12]
+        return self.cache_dir / f"localpack-{digest}.json.gz"
+
+    def get_stamp(self) -> List[int]:
+        """Cheap fingerprint of the pack: its own mtime/size, or the mtimes of
+        the system and media folders for a directory pack"""
+        if self.pack_path.is_file():
+            stat = self.pack_path.stat()
+            return [stat.st_size, int(stat.st_mtime)]
+
+        stamp = [int(self.pack_path.stat().st_mtime)]
+        with os.scandir(self.pack_path) as systems_it:
+            for system_entry in sorted(systems_it, key=lambda e: e.name):
+                if not system_entry.is_dir():
+                    continue
+                stamp.append(int(system_entry.stat().st_mtime))
+                with os.scandir(system_entry.path) as media_it:
+                    for media_entry in sorted(media_it, key=lambda e: e.name):
+                        if media_entry.is_dir():
+                            stamp.append(int(media_entry.stat().st_mtime))
+        return stamp
+
+    def load(self) -> bool:
+        """Load the lookup file, rebuilding it only when the pack changed"""
+        if self.__loaded:
+            return bool(self.index)
+        self.__loaded = True
+
+        if not self.pack_path.exists():
+            print(f"Local media pack {self.pack_path} not found")
+            return False
+
+        stamp = self.get_stamp()
+        index_path = self.get_index_path()
+        if index_path.exists():
+            try:
+                data = json.loads(gzip.decompress(index_path.read_bytes()))
+                if data.get("version") == INDEX_VERSION and data.get("stamp") == stamp:
+                    self.index = data.get("entries", {})
+                    return bool(self.index)
+            except (OSError, ValueError) as e:
+                print(f"Rebuilding corrupt local pack index {index_path}: {e}")
+
+        print(f"Indexing local media pack {self.pack_path}...")
+        self.index = self.build_index()
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_suffix(".tmp")
+            data = {"version": INDEX_VERSION, "stamp": stamp, "entries": self.index}
+            tmp_path.write_bytes(gzip.compress(json.dumps(data, separators=(",", ":")).encode()))
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            print(f"Error writing local pack index {index_path}: {e}")
+        print(f"Indexed {sum(len(v) for v in self.index.values())} local media entries")
+        return bool(self.index)
+
+    def build_index(self) -> Dict[str, Dict[str, Union[str, List[int]]]]:
+        index: Dict[str, Dict[str, Union[str, List[int]]]] = {}
+        if self.is_tarball():
+            with tarfile.open(self.pack_path) as tar:
+                plain = self.is_plain_tar()
+                for member in tar:
+                    if member.isfile():
+                        # Plain tars are read back by offset, compressed ones by member name
+                        ref = [member.offset_data, member.size] if plain else member.name
+                        self.add_index_entry(index, member.name, ref)
+        else:
+            for dirpath, _, filenames in os.walk(self.pack_path):
+                for filename in filenames:
+                    rel_path = os.path.relpath(os.path.join(dirpath, filename), self.pack_path)
+                    self.add_index_entry(index, rel_path, rel_path)
+        return index
+
+    @staticmethod
+    def add_index_entry(index, rel_path: str, ref) -> None:
+        parts = Path(rel_path).parts
+        if len(parts) < 3 or not parts[-1].lower().endswith(IMAGE_EXTENSIONS):
+            return
+        system, media_folder, filename = parts[-3], parts[-2], parts[-1]
+        media_type = LIBRETRO_MEDIA_FOLDERS.get(media_folder.lower(), media_folder)
+        entries = index.setdefault(f"{system.upper()}/{media_type}", {})
+        stem = Path(filename).stem
+        if _CRC_PATTERN.match(stem):
+            entries[f"crc:{stem.upper()}"] = ref
+        key = f"name:{normalize_name(stem)}"
+        tagged = _TAGS_PATTERN.search(stem) is not None
+        if tagged:
+            # Exact file name first, so "(Europe)" still finds its own artwork
+            entries[f"file:{stem.lower()}"] = ref
+        # Untagged names win over regional variants sharing the same normalized key
+        if key not in entries or not tagged:
+            entries[key] = ref
+
+    def lookup(self, system_name: str, media_type: str, crc: str, game_name: str):
+        entries = self.index.get(f"{system_name.upper()}/{media_type}")
+        if not entries:
+            return None
+        if crc and f"crc:{crc.upper()}" in entries:
+            return entries[f"crc:{crc.upper()}"]
+        if game_name.lower().endswith(".sh"):
+            game_name = game_name[:-3]
+        return entries.get(f"file:{game_name.lower()}") or entries.get(
+            f"name:{normalize_name(game_name)}"
+        )
+
+    def read(self, ref) -> Optional[bytes]:
+        try:
+            if isinstance(ref, list):
+                offset, size = ref
+                with self.pack_path.open("rb") as file:
+                    file.seek(offset)
+                    return file.read(size)
+            if self.pack_path.is_file():
+                if self.__tar is None:
+                    self.__tar = tarfile.open(self.pack_path)
+                member = self.__tar.extractfile(ref)
+                return member.read() if member else None
+            return (self.pack_path / ref).read_bytes()
+        except (OSError, KeyError, tarfile.TarError) as e:
+            print(f"Error reading {ref} from local pack: {e}")
+            return None
+
+    def get_medias(
+        self, system_name: str, crc: str, game_name: str, media_types: List[str]
+    ) -> Dict[str, bytes]:
+        medias: Dict[str, bytes] = {}
+        if not self.load():
+            return medias
+        for media_type in media_types:
+            ref = self.lookup(system_name, media_type, crc, game_name)
+            if ref is None:
+                continue
+            media = self.read(ref)
+            if media:
+                medias[media_type] = media
+        return medias
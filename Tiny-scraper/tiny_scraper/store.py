@@ -0,0 +1,178 @@
+import os
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+class MediaStore:
+    """Content-addressed store for scraped images of one storage root.
+
+    Images are keyed by the SHA-1 of the downloaded bytes plus an optional
+    output profile suffix. When the filesystem supports hardlinks, each image
+    is kept once under objects/ and the per-ROM files in Imgs are hardlinks to
+    it. FAT/exFAT cards have no hardlinks, so no objects are kept there: the
+    first Imgs file written for a key is the canonical copy and later variants
+    are copied from it. manifest.jsonl maps media URLs to keys, so known media
+    are never downloaded again, and records which Imgs file holds which key.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.objects_dir = root / "objects"
+        self.manifest_path = root / "manifest.jsonl"
+        self.urls: Dict[str, str] = {}
+        self.files: Dict[str, str] = {}
+        self.copies: Dict[str, List[str]] = {}
+        self.hits = 0
+        self.__hardlinks: Optional[bool] = None
+        self.__loaded = False
+
+    def load(self) -> None:
+        if self.__loaded:
+            return
+        self.__loaded = True
+        if not self.manifest_path.exists():
+            return
+
+        records = 0
+        with self.manifest_path.open("r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from an interrupted session
+                records += 1
+                if "url" in record:
+                    self.urls[record["url"]] = record["key"]
+                elif "file" in record:
+                    self.add_file(record["file"], record["key"])
+
+        # The manifest is append-only, compact it once superseded records pile up
+        if records > 2 * (len(self.urls) + len(self.files)) + 100:
+            self.compact()
+
+    def compact(self) -> None:
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as file:
+            for url, key in self.urls.items():
+                file.write(json.dumps({"url": url, "key": key}) + "\n")
+            for path, key in self.files.items():
+                file.write(json.dumps({"file": path, "key": key}) + "\n")
+        os.replace(tmp_path, self.manifest_path)
+
+    def append(self, record: Dict[str, str]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self.manifest_path.open("a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def add_file(self, file_key: str, key: str) -> None:
+        self.files[file_key] = key
+        self.copies.setdefault(key, []).append(file_key)
+
+    @staticmethod
+    def hash(data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    def object_path(self, key: str) -> Path:
+        return self.objects_dir / key[:2] / f"{key}.png"
+
+    def has(self, key: str) -> bool:
+        return self.object_path(key).exists()
+
+    def find(self, key: str) -> Optional[Path]:
+        """Locate a stored copy of key, the object or any Imgs file holding it"""
+        self.load()
+        object_path = self.object_path(key)
+        if object_path.exists():
+            return object_path
+        for file_key in self.copies.get(key, []):
+            # Skip copies that were since overwritten with another image or deleted
+            if self.files.get(file_key) == key and os.path.exists(file_key):
+                return Path(file_key)
+        return None
+
+    def read_url(self, url: str) -> Optional[bytes]:
+        """Return the stored bytes of an already downloaded media URL"""
+        self.load()
+        key = self.urls.get(url)
+        path = self.find(key) if key else None
+        if not path:
+            return None
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        self.hits += 1
+        return data
+
+    def add(self, data: bytes, url: str = "") -> str:
+        """Store downloaded bytes once and return their key"""
+        self.load()
+        key = self.hash(data)
+        if self.supports_hardlinks() and not self.has(key):
+            self.write_object(self.object_path(key), data)
+        if url and self.urls.get(url) != key:
+            self.urls[url] = key
+            self.append({"url": url, "key": key})
+        return key
+
+    def add_variant(self, key: str, profile: str, encode: Callable[[], bytes]) -> tuple[str, Optional[bytes]]:
+        """Key of an encoded variant of an object, encoding only if no copy exists yet.
+
+        Returns the encoded bytes too when they had to be produced.
+        """
+        variant_key = f"{key}-{profile}"
+        if self.find(variant_key):
+            return variant_key, None
+        data = encode()
+        if self.supports_hardlinks():
+            self.write_object(self.object_path(variant_key), data)
+        return variant_key, data
+
+    @staticmethod
+    def write_object(object_path: Path, data: bytes) -> None:
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = object_path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, object_path)
+
+    def supports_hardlinks(self) -> bool:
+        if self.__hardlinks is None:
+            probe = self.root / ".probe"
+            link = self.root / ".probe-link"
+            try:
+                self.root.mkdir(parents=True, exist_ok=True)
+                probe.write_bytes(b"")
+                link.unlink(missing_ok=True)
+                os.link(probe, link)
+                self.__hardlinks = True
+            except OSError:
+                self.__hardlinks = False
+            finally:
+                link.unlink(missing_ok=True)
+                probe.unlink(missing_ok=True)
+            print(f"Media store {self.root} hardlinks: {self.__hardlinks}")
+        return self.__hardlinks
+
+    def materialize(self, key: str, dest: Path, data: Optional[bytes] = None) -> None:
+        """Make dest show the stored image: hardlink, copy of an existing copy, or data"""
+        self.load()
+        source = self.find(key)
+        if dest.exists():
+            if source and os.path.samefile(source, dest):
+                return
+            dest.unlink()
+        if source and self.supports_hardlinks():
+            os.link(source, dest)
+        elif source:
+            shutil.copyfile(source, dest)
+        elif data is not None:
+            dest.write_bytes(data)
+        else:
+            raise FileNotFoundError(f"No stored copy of {key} for {dest}")
+        file_key = str(dest)
+        if self.files.get(file_key) != key:
+            self.add_file(file_key, key)
+            self.append({"file": file_key, "key": key})
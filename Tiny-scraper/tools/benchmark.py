@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for the Tiny Scraper backend.
+
+Builds synthetic ROM trees, then times Scraper.get_roms, CRC32 hashing and a
+batch scrape against the local mock server (mock_server.py), reporting ROMs/s,
+requests per ROM, media store hits and peak RSS. Each size runs in a fresh
+process with its own mock server, since peak RSS never goes down within one.
+Nothing here touches the real services.
+
+    python3 tools/benchmark.py --sizes 100 1000 10000 --latency 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tiny_scraper"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_server import start_server  # noqa: E402
+from scraper import Scraper  # noqa: E402
+
+SYSTEM = "GBA"
+SYSTEM_ID = 12
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_rom_tree(root: Path, count: int, rom_size: int, folders: int) -> None:
+    system_path = root / SYSTEM
+    rng = random.Random(count)
+    payload = rng.randbytes(rom_size)
+    for i in range(count):
+        folder = system_path / f"folder{i % folders}" if folders > 1 else system_path
+        folder.mkdir(parents=True, exist_ok=True)
+        region = ("USA", "Europe", "Japan")[i % 3]
+        # Vary the first bytes so every ROM gets its own CRC
+        (folder / f"Game {i // 3:05d} ({region}).gba").write_bytes(i.to_bytes(4, "little") + payload[4:])
+
+
+def run(size: int, args, server) -> dict:
+    work_dir = Path(tempfile.mkdtemp(prefix=f"tiny-bench-{size}-"))
+    try:
+        roms_root = work_dir / "Roms"
+        build_rom_tree(roms_root, size, args.rom_size, args.folders)
+
+        scraper = Scraper()
+        scraper.cache_dir = work_dir / "cache"
+        host, port = server.server_address[:2]
+        scraper.api_url = f"http://{host}:{port}/api2"
+        scraper.ports_url = f"http://{host}:{port}/ports"
+        media_types = [scraper.media_type] + args.extra_media
+        scraper.use_media_store = not args.no_store
+        # Kept on the temporary ROM root, like the app keeps it on the card
+        store = scraper.set_media_store(str(roms_root))
+
+        result = {"size": size}
+
+        # Scraper logs every ROM, keep that out of the report unless asked
+        log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+        start = time.perf_counter()
+        roms = scraper.get_roms(str(roms_root), SYSTEM)
+        result["get_roms_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for rom in roms:
+            rom.set_crc(scraper.get_crc32_from_file(roms_root / SYSTEM / rom.filename))
+        result["hash_s"] = time.perf_counter() - start
+
+        scrape_roms = roms[: args.scrape_limit] if args.scrape_limit else roms
+        for attempt in range(2 if args.warm else 1):
+            server.state.reset()
+            if store:
+                store.hits = 0
+            success = 0
+            start = time.perf_counter()
+            for rom in scrape_roms:
+                with log:
+                    medias = scraper.scrape_medias(rom.crc, rom.name, SYSTEM_ID, media_types, SYSTEM)
+                if scraper.media_type in medias:
+                    imgs_folder = (roms_root / SYSTEM / rom.filename).parent / "Imgs"
+                    imgs_folder.mkdir(exist_ok=True)
+                    img_path = imgs_folder / f"{rom.name}.png"
+                    if store:
+                        store.materialize(store.add(medias[scraper.media_type]), img_path, medias[scraper.media_type])
+                    else:
+                        img_path.write_bytes(medias[scraper.media_type])
+                    success += 1
+            key = "scrape_warm" if attempt else "scrape"
+            result[f"{key}_s"] = time.perf_counter() - start
+            result[f"{key}_count"] = len(scrape_roms)
+            result[f"{key}_success"] = success
+            result[f"{key}_requests"] = server.state.total_requests()
+            result[f"{key}_store_hits"] = store.hits if store else 0
+
+        result["peak_rss_mb"] = peak_rss_mb()
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def measure(size: int, args) -> dict:
+    server = start_server(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        missing_rate=args.missing_rate,
+    )
+    try:
+        return run(size, args, server)
+    finally:
+        server.shutdown()
+
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def report(result: dict) -> None:
+    size = result["size"]
+    print(f"\n== {size} ROMs ==")
+    print(f"get_roms : {result['get_roms_s']:8.3f} s  {rate(size, result['get_roms_s']):10.0f} ROMs/s")
+    print(f"hashing  : {result['hash_s']:8.3f} s  {rate(size, result['hash_s']):10.0f} ROMs/s")
+    for key in ("scrape", "scrape_warm"):
+        if f"{key}_s" not in result:
+            continue
+        count = result[f"{key}_count"]
+        print(
+            f"{key:<9}: {result[f'{key}_s']:8.3f} s  {rate(count, result[f'{key}_s']):10.1f} ROMs/s  "
+            f"{result[f'{key}_requests'] / max(count, 1):5.2f} req/ROM  "
+            f"{result[f'{key}_store_hits']:6d} store hits  "
+            f"{result[f'{key}_success']}/{count} ok"
+        )
+    print(f"peak RSS : {result['peak_rss_mb']:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiny Scraper throughput benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rom-size", type=int, default=32 * 1024, help="bytes per synthetic ROM")
+    parser.add_argument("--folders", type=int, default=1, help="spread ROMs over this many sub folders")
+    parser.add_argument("--scrape-limit", type=int, default=0, help="scrape only the first N ROMs, 0 for all")
+    parser.add_argument("--extra-media", nargs="*", default=[], help="extra media types, e.g. box-2D wheel")
+    parser.add_argument("--warm", action="store_true", help="scrape a second time to measure the cached path")
+    parser.add_argument("--no-store", action="store_true", help="scrape without the media store, to compare")
+    parser.add_argument("--verbose", action="store_true", help="show the scraper log")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--missing-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for size in args.sizes:
+            report(pool.apply(measure, (size, args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Compare artwork output profiles: bytes written and decode time per profile.
+
+    python3 tools/encode_benchmark.py                # synthetic screenshots
+    python3 tools/encode_benchmark.py shot1.png ...  # real scraped media
+"""
+
+import argparse
+import random
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tiny_scraper"))
+
+from PIL import Image  # noqa: E402
+from encoder import encode_image, get_output_profile  # noqa: E402
+
+PROFILES = [
+    ("original", 0),
+    ("320x240", 0),
+    ("360x240", 0),
+    ("360x360", 0),
+    ("320x240", 256),
+    ("360x240", 256),
+    ("360x360", 256),
+]
+
+
+def legacy_encode(data: bytes) -> bytes:
+    """What save_screenshot did before output profiles: stretch to 320x240, default PNG"""
+    img = Image.open(BytesIO(data)).resize((320, 240), Image.LANCZOS)
+    output = BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def synthetic_screenshot(size, seed) -> bytes:
+    """Pixel-art like frame: flat tiles plus noise, similar to emulator captures"""
+    rng = random.Random(seed)
+    img = Image.new("RGB", size)
+    tile = 16
+    for y in range(0, size[1], tile):
+        for x in range(0, size[0], tile):
+            color = tuple(rng.randrange(256) for _ in range(3))
+            img.paste(color, (x, y, x + tile, y + tile))
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    img = Image.blend(img, noise, 0.15)
+    output = BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def decode_time(data: bytes, loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        img = Image.open(BytesIO(data))
+        img.load()
+    return (time.perf_counter() - start) / loops
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiny Scraper output profile benchmark")
+    parser.add_argument("images", nargs="*", help="PNG files to encode, synthetic ones if empty")
+    parser.add_argument("--loops", type=int, default=20, help="decode repetitions per image")
+    args = parser.parse_args()
+
+    if args.images:
+        sources = [Path(path).read_bytes() for path in args.images]
+    else:
+        sources = [synthetic_screenshot(size, i) for i, size in enumerate([(320, 224), (640, 480), (1280, 720)] * 2)]
+
+    encoders = [("legacy stretch 320x240", legacy_encode)]
+    for name, colors in PROFILES:
+        profile = get_output_profile(name, 0, colors)
+        label = profile["name"] if profile else "original"
+        encoders.append((label, (lambda p: (lambda data: encode_image(data, p) if p else data))(profile)))
+
+    print(f"{len(sources)} images, {sum(len(s) for s in sources) / 1024:.1f} KB downloaded")
+    print(f"{'profile':<24}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    for label, encode in encoders:
+        total_bytes = 0
+        encode_s = 0.0
+        decode_s = 0.0
+        for data in sources:
+            start = time.perf_counter()
+            output = encode(data)
+            encode_s += time.perf_counter() - start
+            total_bytes += len(output)
+            decode_s += decode_time(output, args.loops)
+        print(f"{label:<24}{total_bytes:>12}{encode_s * 1000:>12.1f}{decode_s * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
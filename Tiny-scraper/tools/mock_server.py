@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Local stand-in for ScreenScraper and PortMaster-Info used by benchmark.py.
+
+Serves canned jeuInfos.php JSON, PNG media, ports.json and port screenshots
+with configurable latency, error rate and rate limit. Point the scraper at it
+with "api_url": "http://127.0.0.1:8765/api2" and
+"ports_url": "http://127.0.0.1:8765/ports" in config.json.
+"""
+
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MEDIA_TYPES = ["ss", "sstitle", "box-2D", "wheel"]
+REGIONS = ["us", "eu", "jp", "wor"]
+
+
+def make_png(width: int, height: int, seed: int) -> bytes:
+    """Build a small gradient PNG without needing PIL"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    r, g, b = seed & 0xFF, (seed >> 8) & 0xFF, (seed >> 16) & 0xFF
+    rows = b"".join(
+        b"\x00" + bytes(((r + y) & 0xFF, g, (b + y) & 0xFF)) * width for y in range(height)
+    )
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 6)) + chunk(b"IEND", b"")
+
+
+class MockState:
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit=0, ports=100, missing_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.missing_rate = missing_rate
+        self.ports_count = ports
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.png_cache = {}
+
+    def count(self, kind):
+        with self.lock:
+            self.counters[kind] = self.counters.get(kind, 0) + 1
+
+    def total_requests(self):
+        with self.lock:
+            return sum(v for k, v in self.counters.items() if not k.startswith("status_"))
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+
+    def allow(self):
+        """Fixed one-second window limiter, like ScreenScraper's per-thread quota"""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count <= self.rate_limit
+
+    def png(self, key):
+        """Media bodies are shared per key so generating them stays off the clock"""
+        with self.lock:
+            if key not in self.png_cache:
+                self.png_cache[key] = make_png(320, 240, zlib.crc32(key.encode()))
+            return self.png_cache[key]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockScraper/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, avoid Nagle + delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body: bytes, content_type="application/json"):
+        self.state.count(f"status_{status}")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            return self.send_body(200, json.dumps(self.state.counters).encode())
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if not self.state.allow():
+            self.state.count("rate_limited")
+            return self.send_body(429, b"Too many requests", "text/plain")
+        if self.state.error_rate and random.random() < self.state.error_rate:
+            self.state.count("errors")
+            return self.send_body(500, b"Internal error", "text/plain")
+
+        if url.path == "/api2/jeuInfos.php":
+            self.state.count("jeuInfos")
+            return self.serve_game_info(parse_qs(url.query))
+        if url.path.startswith("/media/"):
+            self.state.count("media")
+            return self.send_body(200, self.state.png(url.path.rsplit("/", 1)[-1]), "image/png")
+        if url.path == "/ports/ports.json":
+            self.state.count("ports.json")
+            return self.serve_ports()
+        if url.path.startswith("/ports/images/"):
+            self.state.count("port_image")
+            return self.send_body(200, self.state.png(url.path.split("/")[3]), "image/png")
+        self.state.count("not_found")
+        return self.send_body(404, b"Not found", "text/plain")
+
+    def serve_game_info(self, query):
+        crc = (query.get("crc") or [""])[0].upper()
+        name = (query.get("romnom") or [""])[0]
+        system_id = (query.get("systemeid") or ["0"])[0]
+        if random.Random(crc + name).random() < self.state.missing_rate:
+            return self.send_body(404, b"Erreur : Rom/Iso/Dossier non trouvee !", "text/plain")
+
+        medias = [
+            {
+                "type": media_type,
+                "region": region,
+                "url": f"{self.base_url()}/media/{system_id}/{crc or 'noname'}/{media_type}-{region}.png",
+                "format": "png",
+            }
+            for media_type in MEDIA_TYPES
+            for region in REGIONS
+        ]
+        data = {
+            "header": {"APIversion": "2.0", "success": "true"},
+            "response": {
+                "jeu": {
+                    "id": str(zlib.crc32((crc + name).encode())),
+                    "noms": [{"region": "wor", "text": name}],
+                    "systeme": {"id": system_id},
+                    "synopsis": [{"langue": "en", "text": "Mock synopsis " * 20}],
+                    "medias": medias,
+                }
+            },
+        }
+        self.send_body(200, json.dumps(data).encode())
+
+    def serve_ports(self):
+        ports = {
+            f"port{i}.zip": {
+                "name": f"port{i}.zip",
+                "items": [f"Port {i}.sh", f"port{i}/"],
+                "attr": {"title": f"Port {i}", "image": {"screenshot": "screenshot.png"}},
+            }
+            for i in range(self.state.ports_count)
+        }
+        self.send_body(200, json.dumps({"ports": ports}).encode())
+
+
+def start_server(host="127.0.0.1", port=0, **state_kwargs):
+    """Start the mock server on a daemon thread and return it, port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(**state_kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock ScreenScraper/PortMaster server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before 429, 0 to disable")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="fraction of games reported as not found")
+    parser.add_argument("--ports", type=int, default=100, help="number of entries in ports.json")
+    args = parser.parse_args()
+
+    server = start_server(
+        args.host,
+        args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        ports=args.ports,
+        missing_rate=args.missing_rate,
+    )
+    print(f"Mock server listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()